@@ -0,0 +1,84 @@
+import threading
+import time
+
+from django.core.cache.backends import locmem
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as django_backend
+
+from . import metrics
+
+_missing = object()
+
+
+class InstrumentedCacheMixin:
+    """Считает попадания и промахи кэша по префиксу ключа.
+
+    get_many и get_or_set у части бэкендов устроены через get: вложенные
+    вызовы не считаются, чтобы каждый ключ попал в метрики один раз.
+    """
+
+    _local = threading.local()
+
+    def _counting(self):
+        return not getattr(self._local, 'quiet', False)
+
+    def _quiet(self, func, *args, **kwargs):
+        quiet = getattr(self._local, 'quiet', False)
+        self._local.quiet = True
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self._local.quiet = quiet
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _missing, version=version)
+        if self._counting():
+            metrics.record_cache(key, value is not _missing)
+        return default if value is _missing else value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        if not self._counting():
+            return super().get_many(keys, version=version)
+        found = self._quiet(super().get_many, keys, version=version)
+        for key in keys:
+            metrics.record_cache(key, key in found)
+        return found
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None):
+        value = self.get(key, _missing, version=version)
+        if value is not _missing:
+            return value
+        return self._quiet(
+            super().get_or_set, key, default, timeout=timeout, version=version
+        )
+
+
+class LocMemCache(InstrumentedCacheMixin, locmem.LocMemCache):
+    pass
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.record_render(
+                self.origin.template_name or '<string>',
+                time.perf_counter() - started
+            )
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """Бэкенд шаблонов Django, который меряет время рендеринга."""
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
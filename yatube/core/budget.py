@@ -0,0 +1,136 @@
+import os
+import sys
+import time
+from collections import Counter
+
+import django
+from django.conf import settings
+from django.db import connection
+
+# Потолок времени ответа по умолчанию, в секундах. Ловит не медленный
+# сервер, а алгоритмические регрессии: на наборе из сотен записей
+# он превышается только работой, растущей с объёмом данных.
+RENDER_CEILING = 1.0
+
+SITE_PACKAGES = f'{os.sep}site-packages{os.sep}'
+
+ORM = os.path.join(os.path.dirname(django.__file__), 'db', '')
+
+REPORT_LIMIT = 10
+
+# Обёртки вокруг всего запроса: их строка ничего не говорит о том,
+# откуда пришёл запрос к базе.
+INSTRUMENTATION = {__name__, 'core.backends', 'core.middleware'}
+
+
+def project_frame(frame):
+    filename = frame.f_code.co_filename
+    return (
+        filename.startswith(settings.BASE_DIR)
+        and SITE_PACKAGES not in filename
+        and frame.f_globals.get('__name__') not in INSTRUMENTATION
+    )
+
+
+def orm_frame(frame):
+    filename = frame.f_code.co_filename
+    return filename.startswith(ORM) or filename == __file__
+
+
+def describe(frame, path):
+    return f'{path}:{frame.f_lineno} in {frame.f_code.co_name}'
+
+
+def template_frame(frame):
+    """Узел шаблона, который сейчас рендерится, или None."""
+    if frame.f_code.co_name != 'render_annotated':
+        return None
+    node = frame.f_locals.get('self')
+    origin = getattr(node, 'origin', None)
+    token = getattr(node, 'token', None)
+    if origin is None or token is None:
+        return None
+    return f'{origin.template_name}:{token.lineno}'
+
+
+def call_site():
+    """Место запроса: вызов из библиотеки, узел шаблона и код проекта.
+
+    Ленивая загрузка связи из шаблона видна только по шаблону: кода
+    проекта между рендерингом и ORM нет. Запросы сессий и auth идут
+    из кода Django, его строка тоже попадает в отчёт.
+    """
+    library = code = template = None
+    frame = sys._getframe(1)
+    while frame is not None and orm_frame(frame):
+        frame = frame.f_back
+    if frame is not None and not project_frame(frame):
+        library = describe(
+            frame, frame.f_code.co_filename.split(SITE_PACKAGES, 1)[-1]
+        )
+    while frame is not None and (code is None or template is None):
+        if code is None and project_frame(frame):
+            code = describe(
+                frame,
+                os.path.relpath(frame.f_code.co_filename, settings.BASE_DIR)
+            )
+        if template is None:
+            template = template_frame(frame)
+        frame = frame.f_back
+    return ' ← '.join(site for site in (library, template, code) if site)
+
+
+class QueryLog:
+    """Обёртка execute_wrapper: текст каждого запроса и место вызова."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append((sql, call_site()))
+        return execute(sql, params, many, context)
+
+    def __len__(self):
+        return len(self.queries)
+
+    def report(self, limit=REPORT_LIMIT):
+        """Повторяющиеся запросы сверху: так N+1 видно сразу."""
+        lines = []
+        for (sql, site), count in Counter(self.queries).most_common(limit):
+            lines.append(f'{count}× {site or "<вне проекта>"}')
+            lines.append(f'    {sql}')
+        return '\n'.join(lines)
+
+
+class QueryBudgetMixin:
+    """Проверки бюджета запросов и времени ответа для TestCase.
+
+    Бюджет — верхняя граница числа запросов к базе на один ответ.
+    Он не зависит от объёма данных, поэтому запрос в цикле по записям
+    страницы выбивается за бюджет на первом же прогоне.
+    """
+
+    render_ceiling = RENDER_CEILING
+
+    def assertQueryBudget(self, budget, client, url, method='get',
+                          status=200, **kwargs):
+        queries = QueryLog()
+        with connection.execute_wrapper(queries):
+            started = time.perf_counter()
+            response = getattr(client, method)(url, **kwargs)
+            if response.streaming:
+                # Потоковый ответ читает базу, пока его отдают.
+                b''.join(response.streaming_content)
+            elapsed = time.perf_counter() - started
+        self.assertEqual(response.status_code, status, url)
+        if len(queries) > budget:
+            self.fail(
+                f'{url}: {len(queries)} запросов при бюджете {budget}\n'
+                f'{queries.report()}'
+            )
+        if elapsed > self.render_ceiling:
+            self.fail(
+                f'{url}: ответ за {elapsed:.3f} с при потолке '
+                f'{self.render_ceiling} с'
+            )
+        return response
@@ -0,0 +1,221 @@
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Границы корзин гистограмм времени, в секундах.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Метка view вне запроса: фоновые потоки, команды, неразобранный адрес.
+NO_VIEW = 'none'
+
+METRICS = {
+    'yatube_request_seconds': (
+        'histogram', 'Время ответа представления.'
+    ),
+    'yatube_db_queries_total': (
+        'counter', 'Число запросов к базе.'
+    ),
+    'yatube_db_query_seconds_total': (
+        'counter', 'Суммарное время запросов к базе.'
+    ),
+    'yatube_cache_hits_total': (
+        'counter', 'Попадания в кэш по префиксу ключа.'
+    ),
+    'yatube_cache_misses_total': (
+        'counter', 'Промахи кэша по префиксу ключа.'
+    ),
+    'yatube_template_render_seconds': (
+        'histogram', 'Время рендеринга шаблона верхнего уровня.'
+    ),
+    'yatube_db_connections_opened_total': (
+        'counter', 'Открытые соединения с базой.'
+    ),
+    'yatube_db_connections_closed_total': (
+        'counter', 'Закрытые соединения с базой.'
+    ),
+    'yatube_db_connection_seconds_total': (
+        'counter', 'Суммарное время жизни закрытых соединений.'
+    ),
+    'yatube_db_health_check_failures_total': (
+        'counter', 'Соединения, не прошедшие проверку перед запросом.'
+    ),
+    'yatube_db_busy_errors_total': (
+        'counter', 'Запросы, не дождавшиеся блокировки базы.'
+    ),
+}
+
+# Хвост ключа, который меняется от записи к записи: хеш фрагмента
+# {% cache %}, номер, штамп. Остаётся префикс с ограниченным числом
+# значений.
+KEY_SEPARATOR = re.compile(r':|\|\|')
+
+HASH_SUFFIX = re.compile(r'\.[0-9a-f]{32}$')
+
+_view = ContextVar('metrics_view', default=NO_VIEW)
+
+
+def set_view(name):
+    return _view.set(name)
+
+
+def reset_view(token):
+    _view.reset(token)
+
+
+def current_view():
+    return _view.get()
+
+
+def key_prefix(key):
+    return HASH_SUFFIX.sub('', KEY_SEPARATOR.split(str(key), 1)[0])
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip((*self.buckets, '+Inf'), self.counts):
+            total += count
+            yield bound, total
+
+
+def format_labels(labels, **extra):
+    pairs = [*labels, *extra.items()]
+    if not pairs:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', r'\\').replace('"', r'\"').replace(
+            '\n', r'\n'
+        ))
+        for name, value in pairs
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+class Registry:
+    """Метрики процесса: счётчики и гистограммы с метками.
+
+    Каждый процесс копит свои значения; Prometheus собирает их
+    с каждого процесса и суммирует сам.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+            self.histograms[key].observe(value)
+
+    def clear(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def render(self):
+        """Текстовый формат экспозиции Prometheus."""
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(
+                (key, list(histogram.cumulative()), histogram.sum,
+                 histogram.count)
+                for key, histogram in self.histograms.items()
+            )
+        lines = []
+        for name, (kind, help_text) in METRICS.items():
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+            for (metric, labels), value in counters:
+                if metric == name:
+                    lines.append(f'{name}{format_labels(labels)} {value}')
+            for (metric, labels), buckets, total, count in histograms:
+                if metric != name:
+                    continue
+                for bound, cumulative in buckets:
+                    lines.append(
+                        f'{name}_bucket{format_labels(labels, le=bound)} '
+                        f'{cumulative}'
+                    )
+                lines.append(f'{name}_sum{format_labels(labels)} {total}')
+                lines.append(f'{name}_count{format_labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+class QueryTimer:
+    """Обёртка execute_wrapper: число запросов и их суммарное время."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+def record_request(view, seconds, queries):
+    registry.observe('yatube_request_seconds', seconds, view=view)
+    registry.inc('yatube_db_queries_total', queries.count, view=view)
+    registry.inc(
+        'yatube_db_query_seconds_total', queries.seconds, view=view
+    )
+
+
+def record_cache(key, hit):
+    name = 'yatube_cache_hits_total' if hit else 'yatube_cache_misses_total'
+    registry.inc(name, view=current_view(), prefix=key_prefix(key))
+
+
+def record_render(template, seconds):
+    registry.observe(
+        'yatube_template_render_seconds',
+        seconds,
+        view=current_view(),
+        template=template
+    )
+
+
+def record_connection_opened(alias):
+    registry.inc('yatube_db_connections_opened_total', alias=alias)
+
+
+def record_connection_closed(alias, seconds):
+    registry.inc('yatube_db_connections_closed_total', alias=alias)
+    registry.inc('yatube_db_connection_seconds_total', seconds, alias=alias)
+
+
+def record_health_check_failure(alias):
+    registry.inc('yatube_db_health_check_failures_total', alias=alias)
+
+
+def record_db_busy():
+    registry.inc('yatube_db_busy_errors_total', view=current_view())
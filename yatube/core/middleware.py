@@ -0,0 +1,76 @@
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.http import HttpResponse
+
+from . import metrics, profiler
+
+UNRESOLVED = 'unresolved'
+
+PROFILE_PARAMETER = 'profile'
+
+PROFILE_REPORT = 'report'
+
+
+class MetricsMiddleware:
+    """Время ответа и запросы к базе с меткой имени представления.
+
+    Стоит первым в MIDDLEWARE, чтобы мерить всю цепочку. У потоковых
+    ответов учитывается время до первого байта.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = metrics.set_view(UNRESOLVED)
+        queries = metrics.QueryTimer()
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(queries):
+                response = self.get_response(request)
+            metrics.record_request(
+                metrics.current_view(),
+                time.perf_counter() - started,
+                queries
+            )
+        finally:
+            metrics.reset_view(token)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics.set_view(request.resolver_match.view_name)
+
+
+class TemplateProfilerMiddleware:
+    """Профиль рендеринга шаблонов по запросу персонала.
+
+    Работает только при TEMPLATE_PROFILING = True. С параметром
+    ?profile в адресе самые дорогие узлы попадают в заголовок
+    Server-Timing, а ?profile=report вместо страницы отдаёт полный
+    отчёт текстом.
+    """
+
+    def __init__(self, get_response):
+        if not settings.TEMPLATE_PROFILING:
+            raise MiddlewareNotUsed
+        profiler.install()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = request.GET.get(PROFILE_PARAMETER)
+        if mode is None or not request.user.is_staff:
+            return self.get_response(request)
+        token = profiler.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            profile = profiler.stop(token)
+        if mode == PROFILE_REPORT:
+            return HttpResponse(
+                profile.report(), content_type='text/plain; charset=utf-8'
+            )
+        response['Server-Timing'] = profile.server_timing()
+        return response
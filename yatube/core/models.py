@@ -0,0 +1,13 @@
+from django.db import models
+
+
+class Version(models.Model):
+    name = models.CharField('Имя', max_length=100, primary_key=True)
+    stamp = models.FloatField('Штамп')
+
+    class Meta:
+        verbose_name = 'Версия кэша'
+        verbose_name_plural = 'Версии кэша'
+
+    def __str__(self) -> str:
+        return self.name
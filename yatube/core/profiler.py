@@ -0,0 +1,133 @@
+import time
+from contextvars import ContextVar
+
+from django.template.base import Node, Template, TextNode, VariableNode
+from django.template.loader_tags import (BlockNode, ExtendsNode,
+                                         IncludeNode)
+
+# Теги, у которых важен аргумент: какой шаблон подключён, какой блок.
+NAMED_TAGS = (BlockNode, ExtendsNode, IncludeNode)
+
+# Сколько строк попадает в заголовок Server-Timing.
+HEADER_LIMIT = 10
+
+_profile = ContextVar('template_profile', default=None)
+
+_installed = False
+
+
+class Profile:
+    """Время и число вызовов по шаблонам, тегам и переменным.
+
+    total — полное время вместе с вложенными узлами, own — только
+    собственное: сумма own по всем строкам равна времени рендеринга.
+    """
+
+    def __init__(self):
+        self.stats = {}
+        self.stack = []
+
+    def measure(self, key, render, *args):
+        self.stack.append(0)
+        started = time.perf_counter()
+        try:
+            return render(*args)
+        finally:
+            elapsed = time.perf_counter() - started
+            children = self.stack.pop()
+            if self.stack:
+                self.stack[-1] += elapsed
+            stat = self.stats.setdefault(key, [0, 0, 0])
+            stat[0] += 1
+            stat[1] += elapsed
+            stat[2] += elapsed - children
+
+    def rows(self):
+        """(имя, вызовы, total, own) по убыванию собственного времени."""
+        return sorted(
+            ((key, *stat) for key, stat in self.stats.items()),
+            key=lambda row: row[3],
+            reverse=True
+        )
+
+    def server_timing(self, limit=HEADER_LIMIT):
+        entries = []
+        for number, (key, calls, total, own) in enumerate(
+            self.rows()[:limit]
+        ):
+            description = key.replace('\\', '\\\\').replace('"', '\\"')
+            entries.append(
+                f'tpl{number};desc="{description} x{calls}";'
+                f'dur={own * 1000:.3f}'
+            )
+        return ', '.join(entries)
+
+    def report(self):
+        lines = [f'{"own, мс":>10} {"total, мс":>10} {"вызовы":>7}  узел']
+        for key, calls, total, own in self.rows():
+            lines.append(
+                f'{own * 1000:10.3f} {total * 1000:10.3f} {calls:7}  {key}'
+            )
+        return '\n'.join(lines) + '\n'
+
+
+def start():
+    return _profile.set(Profile())
+
+
+def stop(token):
+    profile = _profile.get()
+    _profile.reset(token)
+    return profile
+
+
+def node_key(node):
+    """Строка отчёта для узла или None, если узел не меряется."""
+    token = getattr(node, 'token', None)
+    if token is None or isinstance(node, TextNode):
+        return None
+    if isinstance(node, VariableNode):
+        variable, *filters = token.contents.split('|')
+        # post.thumbnail.url и post.thumbnail.width — одна строка.
+        name = '.'.join(variable.strip().split('.')[:2])
+        name += ''.join(f'|{item.split(":")[0]}' for item in filters)
+        return f'{{{{ {name} }}}}'
+    bits = token.split_contents()
+    if isinstance(node, NAMED_TAGS):
+        return '{% ' + ' '.join(bits[:2]) + ' %}'
+    return '{% ' + bits[0] + ' %}'
+
+
+def install():
+    """Оборачивает рендеринг узлов и шаблонов Django.
+
+    Вне профилируемого запроса обёртка стоит одного обращения
+    к ContextVar; включается только настройкой TEMPLATE_PROFILING.
+    """
+    global _installed
+    if _installed:
+        return
+    _installed = True
+    render_annotated = Node.render_annotated
+    template_render = Template._render
+
+    def profiled_node(self, context):
+        profile = _profile.get()
+        key = profile and node_key(self)
+        if key is None:
+            return render_annotated(self, context)
+        return profile.measure(key, render_annotated, self, context)
+
+    def profiled_template(self, context):
+        profile = _profile.get()
+        if profile is None:
+            return template_render(self, context)
+        return profile.measure(
+            f'template {self.origin.template_name or "<string>"}',
+            template_render,
+            self,
+            context
+        )
+
+    Node.render_annotated = profiled_node
+    Template._render = profiled_template
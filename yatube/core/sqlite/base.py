@@ -0,0 +1,121 @@
+import time
+
+from django.db.backends.sqlite3 import base
+
+from .. import metrics
+
+Database = base.Database
+
+# Применяются к каждому новому соединению, по порядку: busy_timeout
+# раньше journal_mode, чтобы переключение в WAL дождалось чужой записи.
+# Переопределяются ключом 'pragmas' в OPTIONS.
+PRAGMAS = {
+    'busy_timeout': 5000,
+    'journal_mode': 'WAL',
+    # В WAL NORMAL не теряет целостность при сбое, а fsync бывает
+    # только на контрольных точках.
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    # Отрицательное значение — размер в КиБ, а не в страницах.
+    'cache_size': -64 * 1024,
+}
+
+# BEGIN IMMEDIATE берёт блокировку записи в начале atomic. С простым
+# BEGIN две транзакции читают, а при записи одна из них сразу получает
+# «database is locked»: busy_timeout для этого случая не ждёт.
+TRANSACTION_MODE = 'IMMEDIATE'
+
+BUSY_MESSAGES = ('database is locked', 'database table is locked')
+
+
+class CursorWrapper(base.SQLiteCursorWrapper):
+    """Считает запросы, которые не дождались блокировки базы."""
+
+    def execute(self, query, params=None):
+        try:
+            return super().execute(query, params)
+        except Database.OperationalError as error:
+            record_busy(error)
+            raise
+
+    def executemany(self, query, param_list):
+        try:
+            return super().executemany(query, param_list)
+        except Database.OperationalError as error:
+            record_busy(error)
+            raise
+
+
+def record_busy(error):
+    if str(error) in BUSY_MESSAGES:
+        metrics.record_db_busy()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """SQLite в режиме WAL с долгоживущими проверяемыми соединениями.
+
+    Настройки соединения задаются один раз при его открытии. При
+    CONN_MAX_AGE соединение переживает запрос; перед первым
+    обращением к базе в новом запросе оно проверяется SELECT 1
+    и при ошибке открывается заново.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.opened_at = None
+        self.health_check_done = False
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = {**PRAGMAS, **params.pop('pragmas', {})}
+        self.transaction_mode = params.pop(
+            'transaction_mode', TRANSACTION_MODE
+        )
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        self.opened_at = time.monotonic()
+        self.health_check_done = True
+        metrics.record_connection_opened(self.alias)
+        return conn
+
+    def create_cursor(self, name=None):
+        return self.connection.cursor(factory=CursorWrapper)
+
+    def _close(self):
+        if self.connection is not None and self.opened_at is not None:
+            metrics.record_connection_closed(
+                self.alias, time.monotonic() - self.opened_at
+            )
+            self.opened_at = None
+        super()._close()
+
+    def is_usable(self):
+        try:
+            self.connection.execute('SELECT 1')
+        except Database.Error:
+            return False
+        return True
+
+    def close_if_unusable_or_obsolete(self):
+        # Вызывается в начале и в конце каждого запроса.
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
+
+    def ensure_connection(self):
+        if (
+            self.connection is not None
+            and not self.health_check_done
+            and not self.in_atomic_block
+        ):
+            self.health_check_done = True
+            if not self.is_usable():
+                metrics.record_health_check_failure(self.alias)
+                self.close()
+        super().ensure_connection()
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {self.transaction_mode}')
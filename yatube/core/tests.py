@@ -1,4 +1,26 @@
-from django.test import Client, TestCase
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.template import Context, Engine, Template
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.cards import attach_card_versions
+from posts.models import Group, Post
+from posts.thumbnails import prefetch
+
+from .backends import LocMemCache
+from .budget import QueryLog
+from .metrics import CONTENT_TYPE, key_prefix, registry
+from .sqlite.base import DatabaseWrapper
+
+User = get_user_model()
 
 
 class URLTests(TestCase):
@@ -10,3 +32,305 @@ class URLTests(TestCase):
         response = self.guest_client.get('/error/')
         template = 'core/404.html'
         self.assertTemplateUsed(response, template)
+
+
+@override_settings(METRICS_TOKEN='secret-token')
+class MetricsTests(TestCase):
+    def setUp(self):
+        registry.clear()
+        self.guest_client = Client()
+
+    def test_metrics_endpoint(self):
+        """После запроса /metrics отдаёт метрики представления."""
+        self.guest_client.get(reverse('posts:index'))
+        self.guest_client.get(reverse('posts:index'))
+        response = self.guest_client.get(
+            reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret-token'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], CONTENT_TYPE)
+        content = response.content.decode()
+        view = 'view="posts:index"'
+        self.assertIn(
+            f'yatube_request_seconds_count{{{view}}} 2', content
+        )
+        self.assertIn(f'yatube_db_queries_total{{{view}}}', content)
+        self.assertIn(f'yatube_db_query_seconds_total{{{view}}}', content)
+        self.assertIn(
+            f'yatube_cache_misses_total{{prefix="template.cache.index_page",'
+            f'{view}}}',
+            content
+        )
+        self.assertIn(
+            f'yatube_cache_hits_total{{prefix="template.cache.index_page",'
+            f'{view}}}',
+            content
+        )
+        self.assertIn(
+            'yatube_template_render_seconds_count{template="posts/index.html",'
+            f'{view}}} 2',
+            content
+        )
+
+    def test_metrics_require_credentials(self):
+        """Без токена или прав персонала /metrics не отвечает даже
+        на запрос с 127.0.0.1, как за локальным прокси.
+        """
+        for headers in (
+            {},
+            {'HTTP_AUTHORIZATION': 'Bearer wrong-token'},
+            {'HTTP_AUTHORIZATION': 'secret-token'},
+        ):
+            with self.subTest(headers=headers):
+                response = self.guest_client.get(
+                    reverse('metrics'), REMOTE_ADDR='127.0.0.1', **headers
+                )
+                self.assertEqual(response.status_code, 404)
+
+    def test_metrics_for_staff(self):
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        self.guest_client.force_login(staff)
+        response = self.guest_client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_empty_token_is_not_accepted(self):
+        response = self.guest_client.get(
+            reverse('metrics'), HTTP_AUTHORIZATION='Bearer '
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_cache_key_prefix(self):
+        """Хвост ключа кэша не попадает в метку."""
+        self.assertEqual(key_prefix('version:posts:1'), 'version')
+        self.assertEqual(
+            key_prefix(
+                'template.cache.post_card.0123456789abcdef0123456789abcdef'
+            ),
+            'template.cache.post_card'
+        )
+
+
+class QueryLogTests(TestCase):
+    def test_report_groups_repeated_queries(self):
+        """Отчёт сводит одинаковые запросы и показывает место вызова."""
+        queries = QueryLog()
+        with connection.execute_wrapper(queries):
+            for pk in range(3):
+                User.objects.filter(pk=pk).exists()
+        self.assertEqual(len(queries), 3)
+        self.assertTrue(queries.report().startswith('3× core/tests.py:'))
+
+
+@override_settings(TEMPLATE_PROFILING=True)
+class TemplateProfilerTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.user = User.objects.create_user(username='user')
+
+    def setUp(self):
+        cache.clear()
+        self.staff_client = Client()
+        self.staff_client.force_login(TemplateProfilerTests.staff)
+
+    def test_report_attributes_time_to_nodes(self):
+        """Отчёт делит время по шаблонам, подключениям, тегам и фильтрам."""
+        response = self.staff_client.get(
+            reverse('posts:post_create'), {'profile': 'report'}
+        )
+        self.assertEqual(response['Content-Type'], 'text/plain; charset=utf-8')
+        report = response.content.decode()
+        for key in (
+            'template posts/create_post.html',
+            '{% include \'includes/header.html\' %}',
+            '{% block content %}',
+            '{{ field|addclass }}',
+        ):
+            with self.subTest(key=key):
+                self.assertIn(key, report)
+
+    def test_server_timing_header(self):
+        response = self.staff_client.get(
+            reverse('posts:index'), {'profile': ''}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('desc="{% cache %} x1"', response['Server-Timing'])
+
+    def test_profile_is_staff_only(self):
+        client = Client()
+        client.force_login(TemplateProfilerTests.user)
+        response = client.get(reverse('posts:index'), {'profile': 'report'})
+        self.assertEqual(response['Content-Type'], 'text/html; charset=utf-8')
+        self.assertNotIn('Server-Timing', response)
+
+
+@override_settings(THUMBNAIL_WORKERS=0)
+class RenderPostListTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='Иван@mail', first_name='Иван', last_name='<Петров>'
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            group=cls.group,
+            text='Тестовый пост'
+        )
+        Post.objects.filter(pk=cls.post.pk).update(
+            pub_date=datetime(2022, 1, 2, tzinfo=timezone.utc)
+        )
+        Post.objects.create(author=cls.user, text='Второй пост')
+
+    def setUp(self):
+        cache.clear()
+
+    def render(self, source=None, **flags):
+        posts = list(Post.objects.select_related('author', 'group'))
+        attach_card_versions(posts)
+        prefetch(posts)
+        return Template(source or (
+            '{% load post_list %}'
+            '{% render_post_list posts link_group=link_group '
+            'no_link_author=no_link_author %}'
+        )).render(Context({
+            'posts': posts,
+            'link_group': flags.get('link_group', False),
+            'no_link_author': flags.get('no_link_author', False),
+        }))
+
+    def test_cards_markup(self):
+        """Тег выводит ту же разметку, что подключение post.html в цикле."""
+        profile_url = reverse(
+            'posts:profile', kwargs={'username': self.user.username}
+        )
+        detail_url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}
+        )
+        html = self.render(link_group=True)
+        self.assertEqual(html.count('<hr>'), 1)
+        self.assertHTMLEqual(
+            html.split('<hr>')[1],
+            f'''
+            <article>
+              <ul>
+                <li>
+                  Автор: Иван &lt;Петров&gt;
+                  <a href="{profile_url}">все посты пользователя</a>
+                </li>
+                <li>Дата публикации: 02 января 2022</li>
+              </ul>
+              <p>Тестовый пост</p>
+              <a href="{detail_url}">подробная информация</a>
+            </article>
+            <a href="/group/test-slug/">все записи группы</a>
+            '''
+        )
+        html = self.render(no_link_author=True)
+        self.assertNotIn(profile_url, html)
+        self.assertNotIn('все записи группы', html)
+
+    def test_same_html_as_include_in_loop(self):
+        for flags in ({}, {'link_group': True, 'no_link_author': True}):
+            with self.subTest(flags=flags):
+                html = self.render(**flags)
+                cache.clear()
+                self.assertHTMLEqual(html, self.render(
+                    '{% for post in posts %}'
+                    '{% include "posts/includes/post.html" %}'
+                    '{% endfor %}',
+                    **flags
+                ))
+
+    def test_cards_are_cached_per_page(self):
+        """Готовые карточки берутся из кэша без обращений к шаблону."""
+        self.render()
+        Post.objects.filter(pk=self.post.pk).update(text='Изменён в обход')
+        with mock.patch.object(Engine, 'get_template') as get_template:
+            html = self.render()
+        get_template.assert_not_called()
+        self.assertIn('Тестовый пост', html)
+
+    def test_bump_is_seen_by_other_worker(self):
+        """Правка в одном процессе сбрасывает карточку в кэше другого."""
+        workers = [LocMemCache(name, {}) for name in ('worker-a', 'worker-b')]
+        for worker in workers:
+            worker.clear()
+        with mock.patch('core.templatetags.post_list.cache', workers[0]):
+            self.assertIn('Тестовый пост', self.render())
+        with mock.patch('core.templatetags.post_list.cache', workers[1]):
+            self.post.text = 'Изменённый пост'
+            self.post.save()
+            self.assertIn('Изменённый пост', self.render())
+        with mock.patch('core.templatetags.post_list.cache', workers[0]):
+            html = self.render()
+        self.assertIn('Изменённый пост', html)
+        self.assertNotIn('Тестовый пост', html)
+
+
+class SQLiteBackendTests(TestCase):
+    def setUp(self):
+        registry.clear()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.path = os.path.join(directory, 'test.sqlite3')
+
+    def open(self, alias='file', **options):
+        wrapper = DatabaseWrapper(
+            {**connection.settings_dict, 'NAME': self.path,
+             'OPTIONS': options},
+            alias
+        )
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_are_applied(self):
+        """Новое соединение открывается в WAL с настроенными прагмами."""
+        wrapper = self.open()
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(wrapper, 'synchronous'), 1)
+        self.assertEqual(self.pragma(wrapper, 'busy_timeout'), 5000)
+        self.assertEqual(self.pragma(wrapper, 'cache_size'), -65536)
+        self.assertIn(
+            'yatube_db_connections_opened_total{alias="file"} 1',
+            registry.render()
+        )
+
+    def test_broken_connection_is_reopened(self):
+        """Сломанное соединение заменяется в начале следующего запроса."""
+        wrapper = self.open()
+        wrapper.ensure_connection()
+        wrapper.connection.close()
+        wrapper.close_if_unusable_or_obsolete()
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+        metrics = registry.render()
+        self.assertIn(
+            'yatube_db_health_check_failures_total{alias="file"} 1', metrics
+        )
+        self.assertIn(
+            'yatube_db_connections_opened_total{alias="file"} 2', metrics
+        )
+
+    def test_transactions_take_write_lock_upfront(self):
+        """Вторая транзакция ждёт блокировку уже на BEGIN и считается."""
+        writer = self.open('writer')
+        waiting = self.open('waiting', pragmas={'busy_timeout': 0})
+        writer._start_transaction_under_autocommit()
+        self.addCleanup(writer.cursor().execute, 'ROLLBACK')
+        with self.assertRaises(OperationalError):
+            waiting._start_transaction_under_autocommit()
+        self.assertIn(
+            'yatube_db_busy_errors_total{view="none"} 1', registry.render()
+        )
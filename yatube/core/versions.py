@@ -0,0 +1,41 @@
+import time
+
+from django.db import connection
+
+from .models import Version
+
+# Штамп имени, которое ещё ни разу не меняли.
+INITIAL = 0.0
+
+
+def get_versions(*names):
+    """Текущие штампы версий в порядке names, одним запросом.
+
+    Штампы лежат в базе, а не в кэше процесса: смену версии видят все
+    процессы сразу, и её нельзя вытеснить из кэша. Внутри транзакции
+    штамп меняется вместе с данными, от которых зависит.
+    """
+    stamps = dict(
+        Version.objects.filter(name__in=names).values_list('name', 'stamp')
+    )
+    return [stamps.get(name, INITIAL) for name in names]
+
+
+def get_version(name):
+    return get_versions(name)[0]
+
+
+def bump_version(*names):
+    """Новый штамп для names: upsert пачками, обычно одним запросом."""
+    now = time.time()
+    table = connection.ops.quote_name(Version._meta.db_table)
+    size = connection.ops.bulk_batch_size(['name', 'stamp'], names)
+    with connection.cursor() as cursor:
+        for start in range(0, len(names), size):
+            chunk = names[start:start + size]
+            rows = ', '.join(['(%s, %s)'] * len(chunk))
+            cursor.execute(
+                f'INSERT INTO {table} (name, stamp) VALUES {rows} '
+                'ON CONFLICT (name) DO UPDATE SET stamp = excluded.stamp',
+                [value for name in chunk for value in (name, now)]
+            )
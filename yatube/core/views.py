@@ -1,6 +1,11 @@
 from http import HTTPStatus
 
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+from .metrics import CONTENT_TYPE, registry
 
 
 def permission_denied(request, exception):
@@ -26,3 +31,26 @@ def server_error(request):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/csrf.html')
+
+
+def metrics_allowed(request):
+    """Персонал или сборщик метрик с токеном METRICS_TOKEN.
+
+    Адрес клиента не проверяется: за локальным обратным прокси все
+    запросы приходят с 127.0.0.1.
+    """
+    if request.user.is_staff:
+        return True
+    token = settings.METRICS_TOKEN
+    scheme, _, credentials = request.META.get(
+        'HTTP_AUTHORIZATION', ''
+    ).partition(' ')
+    return bool(token) and scheme.lower() == 'bearer' and (
+        constant_time_compare(credentials, token)
+    )
+
+
+def metrics(request):
+    if not metrics_allowed(request):
+        raise Http404
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
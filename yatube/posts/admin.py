@@ -1,23 +1,35 @@
 from django.contrib import admin
 
 from .models import Comment, Follow, Group, Post, Word
+from .search import matching
 
 
-class PostAdmin(admin.ModelAdmin):
+class FullTextSearchMixin:
+    """Поиск в админке по индексу FTS5 вместо LIKE '%слово%'."""
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return queryset.filter(matching(self.model, search_term)), False
+
+
+class PostAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('pk', 'text', 'pub_date', 'author', 'group')
     list_editable = ('group',)
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    readonly_fields = ('comments_count',)
     empty_value_display = '-пусто-'
 
 
 class GroupAdmin(admin.ModelAdmin):
-    list_display = ('title', 'slug', 'description')
+    list_display = ('title', 'slug', 'description', 'posts_count')
     search_fields = ('title',)
+    readonly_fields = ('posts_count',)
     empty_value_display = '-пусто-'
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('text', 'author', 'post', 'created')
     search_fields = ('text',)
     list_filter = ('created',)
@@ -0,0 +1,312 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.http import JsonResponse
+from django.views.decorators.http import require_safe
+
+from .feeds import FeedPaginator, pulled_authors
+from .freshness import (conditional, feed_freshness, follow_freshness,
+                        post_freshness, profile_freshness)
+from .models import Comment, Group, Post, Timeline
+from .paginators import KeysetPaginator
+from .thumbnails import prefetch
+from .views import COMMENTS_NUMBER, PAGINATOR_NUMBER
+
+User = get_user_model()
+
+# Публичное имя поля → столбец values(). Клиент выбирает поля
+# параметром ?fields=id,author,...; без него отдаются все.
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'comments_count': 'comments_count',
+    'image': 'image',
+    'thumbnail': 'image',
+}
+
+COMMENT_FIELDS = {
+    'id': 'id',
+    'post': 'post_id',
+    'author': 'author__username',
+    'text': 'text',
+    'created': 'created',
+}
+
+POST_KEYS = ('pub_date', 'id')
+
+COMMENT_KEYS = ('created', 'id')
+
+
+class FieldsError(ValueError):
+    pass
+
+
+def error(status, message):
+    return JsonResponse({'detail': message}, status=status)
+
+
+def json_response(data):
+    return JsonResponse(data, json_dumps_params={'ensure_ascii': False})
+
+
+def requested_fields(request, available):
+    """Поля из ?fields= в порядке схемы; пустой параметр — все поля."""
+    raw = request.GET.get('fields')
+    if not raw:
+        return list(available)
+    names = {name.strip() for name in raw.split(',') if name.strip()}
+    unknown = names - set(available)
+    if unknown:
+        raise FieldsError(
+            f"Неизвестные поля: {', '.join(sorted(unknown))}"
+        )
+    return [name for name in available if name in names]
+
+
+def columns(fields, available, keys):
+    """Столбцы values(): ключи курсора плюс запрошенные поля."""
+    return list(dict.fromkeys(
+        [*keys, *(available[name] for name in fields)]
+    ))
+
+
+def image_url(name):
+    if not name:
+        return None
+    return Post._meta.get_field('image').storage.url(name)
+
+
+def thumbnail_data(thumbnail):
+    if thumbnail is None:
+        return None
+    return {
+        'url': thumbnail.url,
+        'width': thumbnail.width,
+        'height': thumbnail.height,
+        'srcset': thumbnail.srcset,
+        'sizes': thumbnail.sizes,
+        'sources': [
+            {'type': mime_type, 'srcset': srcset}
+            for mime_type, srcset in thumbnail.sources
+        ],
+    }
+
+
+def serialize_posts(rows, fields):
+    thumbnails = {}
+    if 'thumbnail' in fields:
+        # Миниатюры берутся тем же пакетным чтением, что и у HTML-ленты;
+        # посты-заглушки несут только id и имя файла.
+        shells = [
+            Post(pk=row['id'], image=row['image'])
+            for row in rows if row['image']
+        ]
+        prefetch(shells)
+        thumbnails = {post.pk: post.thumbnail for post in shells}
+    results = []
+    for row in rows:
+        item = {}
+        for name in fields:
+            value = row[POST_FIELDS[name]]
+            if name == 'image':
+                value = image_url(value)
+            elif name == 'thumbnail':
+                value = thumbnail_data(thumbnails.get(row['id']))
+            item[name] = value
+        results.append(item)
+    return results
+
+
+def serialize_comments(rows, fields):
+    return [
+        {name: row[COMMENT_FIELDS[name]] for name in fields}
+        for row in rows
+    ]
+
+
+def page_data(page_obj, results):
+    return {
+        'count': page_obj.paginator.count,
+        'next': page_obj.next_cursor,
+        'previous': page_obj.previous_cursor,
+        'results': results,
+    }
+
+
+def cursor_page(request, paginator):
+    return paginator.get_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before')
+    )
+
+
+def posts_page(request, posts, count_key=None, known_count=None):
+    try:
+        fields = requested_fields(request, POST_FIELDS)
+    except FieldsError as exc:
+        return error(HTTPStatus.BAD_REQUEST, str(exc))
+    paginator = PostRows(
+        posts,
+        PAGINATOR_NUMBER,
+        columns=columns(fields, POST_FIELDS, POST_KEYS),
+        count_key=count_key,
+        known_count=known_count
+    )
+    page_obj = cursor_page(request, paginator)
+    return json_response(
+        page_data(page_obj, serialize_posts(page_obj.object_list, fields))
+    )
+
+
+class PostRows(KeysetPaginator):
+    """Посты строками values() с запрошенными столбцами.
+
+    COUNT считается по самим постам: соединения, нужные столбцам
+    автора и группы, заставили бы базу просмотреть таблицу целиком.
+    """
+
+    def __init__(self, posts, per_page, columns, **kwargs):
+        self.posts = posts
+        super().__init__(posts.values(*columns), per_page, **kwargs)
+
+    def total(self):
+        return self.posts.count()
+
+
+class FeedRows(FeedPaginator):
+    """Лента подписок строками values() с теми же столбцами, что у постов.
+
+    Записи Timeline читаются со столбцами поста через post__, затем
+    приводятся к виду строк Post, чтобы слиться с постами популярных
+    авторов.
+    """
+
+    def __init__(self, object_list, per_page, columns, **kwargs):
+        self.columns = columns
+        super().__init__(object_list, per_page, **kwargs)
+
+    def post_columns(self):
+        return [column for column in self.columns if column not in POST_KEYS]
+
+    def entries(self, timeline):
+        return timeline.values(
+            'pub_date',
+            'post_id',
+            *(f'post__{column}' for column in self.post_columns())
+        )
+
+    def entry_post(self, entry):
+        row = {'pub_date': entry['pub_date'], 'id': entry['post_id']}
+        for column in self.post_columns():
+            row[column] = entry[f'post__{column}']
+        return row
+
+    def author_posts(self, author_id):
+        return Post.objects.filter(author_id=author_id).values(*self.columns)
+
+    def key_values(self, row):
+        return [row['pub_date'], row['id']]
+
+
+@require_safe
+@conditional(feed_freshness)
+def index(request):
+    return posts_page(request, Post.objects.all(), 'index')
+
+
+@require_safe
+@conditional(feed_freshness)
+def group_posts(request, slug):
+    group = Group.objects.filter(slug=slug).values_list(
+        'pk', 'posts_count'
+    ).first()
+    if group is None:
+        return error(HTTPStatus.NOT_FOUND, 'Группа не найдена.')
+    group_id, posts_count = group
+    return posts_page(
+        request,
+        Post.objects.filter(group_id=group_id),
+        known_count=posts_count
+    )
+
+
+@require_safe
+@conditional(profile_freshness)
+def profile(request, username):
+    author = User.objects.filter(username=username).values_list(
+        'pk', 'counter__posts_count'
+    ).first()
+    if author is None:
+        return error(HTTPStatus.NOT_FOUND, 'Автор не найден.')
+    author_id, posts_count = author
+    return posts_page(
+        request,
+        Post.objects.filter(author_id=author_id),
+        known_count=posts_count
+    )
+
+
+@require_safe
+@conditional(follow_freshness)
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return error(HTTPStatus.UNAUTHORIZED, 'Нужно войти.')
+    try:
+        fields = requested_fields(request, POST_FIELDS)
+    except FieldsError as exc:
+        return error(HTTPStatus.BAD_REQUEST, str(exc))
+    paginator = FeedRows(
+        Timeline.objects.filter(user=request.user),
+        PAGINATOR_NUMBER,
+        columns=columns(fields, POST_FIELDS, POST_KEYS),
+        count_key=f'follow:{request.user.pk}',
+        authors=pulled_authors(request.user)
+    )
+    page_obj = cursor_page(request, paginator)
+    return json_response(
+        page_data(page_obj, serialize_posts(page_obj.object_list, fields))
+    )
+
+
+@require_safe
+@conditional(post_freshness)
+def post_detail(request, post_id):
+    try:
+        fields = requested_fields(request, POST_FIELDS)
+    except FieldsError as exc:
+        return error(HTTPStatus.BAD_REQUEST, str(exc))
+    row = Post.objects.filter(pk=post_id).values(
+        *columns(fields, POST_FIELDS, POST_KEYS)
+    ).first()
+    if row is None:
+        return error(HTTPStatus.NOT_FOUND, 'Пост не найден.')
+    return json_response(serialize_posts([row], fields)[0])
+
+
+@require_safe
+@conditional(post_freshness)
+def post_comments(request, post_id):
+    try:
+        fields = requested_fields(request, COMMENT_FIELDS)
+    except FieldsError as exc:
+        return error(HTTPStatus.BAD_REQUEST, str(exc))
+    comments_count = Post.objects.filter(pk=post_id).values_list(
+        'comments_count', flat=True
+    ).first()
+    if comments_count is None:
+        return error(HTTPStatus.NOT_FOUND, 'Пост не найден.')
+    paginator = KeysetPaginator(
+        Comment.objects.filter(post_id=post_id).values(
+            *columns(fields, COMMENT_FIELDS, COMMENT_KEYS)
+        ),
+        COMMENTS_NUMBER,
+        keys=COMMENT_KEYS,
+        known_count=comments_count
+    )
+    page_obj = cursor_page(request, paginator)
+    return json_response(
+        page_data(page_obj, serialize_comments(page_obj.object_list, fields))
+    )
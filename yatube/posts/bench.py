@@ -0,0 +1,277 @@
+import math
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import Client
+from django.urls import reverse
+from faker import Faker
+from mixer.backend.django import Mixer
+
+from core.metrics import QueryTimer
+
+from .importer import CommentImporter, FollowImporter, PostImporter
+from .models import Group, Post
+
+User = get_user_model()
+
+SEED = 20220101
+
+SIZES = {
+    '10k': 10_000,
+    '100k': 100_000,
+    '1m': 1_000_000,
+}
+
+POSTS_PER_USER = 50
+
+GROUPS = 20
+
+COMMENTS_PER_POST = 0.5
+
+FOLLOWS_PER_USER = 5
+
+BATCH_SIZE = 2000
+
+# Посты распределены по пяти годам до этой даты.
+EPOCH = datetime(2022, 1, 1, tzinfo=timezone.utc)
+
+SPAN = timedelta(days=5 * 365)
+
+PERCENTILES = (50, 95, 99)
+
+
+def parse_size(value):
+    """10k, 100k, 1m или просто число постов."""
+    value = str(value).lower()
+    if value in SIZES:
+        return SIZES[value]
+    multiplier = {'k': 1000, 'm': 1_000_000}.get(value[-1:], 1)
+    number = value[:-1] if multiplier > 1 else value
+    if not number.isdigit() or not int(number):
+        raise ValueError(f'Некорректный размер набора: {value}')
+    return int(number) * multiplier
+
+
+class Dataset:
+    """Детерминированный синтетический набор на posts постов.
+
+    Пользователи и группы собираются mixer, тексты постов
+    и комментариев — Faker; всё с одним зерном, поэтому один и тот же
+    размер всегда даёт одинаковые данные. Пишется пачками через
+    загрузчики import_yatube.
+    """
+
+    def __init__(self, posts, seed=SEED, batch_size=BATCH_SIZE):
+        self.posts = posts
+        self.users = max(posts // POSTS_PER_USER, 10)
+        self.groups = GROUPS
+        self.comments = int(posts * COMMENTS_PER_POST)
+        self.seed = seed
+        self.batch_size = batch_size
+        self.random = random.Random(seed)
+        self.faker = Faker('ru_RU')
+        self.faker.seed_instance(seed)
+
+    def summary(self):
+        return {
+            'seed': self.seed,
+            'users': self.users,
+            'groups': self.groups,
+            'posts': self.posts,
+            'comments': self.comments,
+        }
+
+    def is_seeded(self):
+        return Post.objects.count() == self.posts and (
+            User.objects.filter(username='user0').exists()
+        )
+
+    def username(self, number):
+        return f'user{number}'
+
+    def author(self):
+        # Степенное распределение: у немногих авторов большинство
+        # постов, как в живом сообществе.
+        return int(self.users * self.random.random() ** 2)
+
+    def seed_users(self):
+        mixer = Mixer(commit=False, locale='ru_RU')
+        mixer.faker.seed_instance(self.seed)
+        random.seed(self.seed)
+        numbers = iter(range(self.users))
+        chunk = list(islice(numbers, self.batch_size))
+        while chunk:
+            users = mixer.cycle(len(chunk)).blend(
+                User,
+                username=(self.username(number) for number in chunk),
+                date_joined=EPOCH - SPAN,
+                is_staff=False,
+                is_superuser=False
+            )
+            with transaction.atomic():
+                User.objects.bulk_create(users)
+            chunk = list(islice(numbers, self.batch_size))
+        groups = mixer.cycle(self.groups).blend(
+            Group,
+            slug=mixer.sequence('group-{0}'),
+            posts_count=0
+        )
+        Group.objects.bulk_create(groups)
+
+    def post_records(self):
+        step = SPAN / self.posts
+        for number in range(self.posts):
+            group = self.random.randrange(self.groups * 2)
+            yield number, {
+                'id': number + 1,
+                'author': self.username(self.author()),
+                'group': f'group-{group}' if group < self.groups else '',
+                'text': self.faker.paragraph(nb_sentences=3),
+                'pub_date': (EPOCH - SPAN + step * number).isoformat(),
+            }
+
+    def comment_records(self):
+        step = SPAN / max(self.comments, 1)
+        for number in range(self.comments):
+            yield number, {
+                'post': self.random.randrange(self.posts) + 1,
+                'author': self.username(self.random.randrange(self.users)),
+                'text': self.faker.sentence(),
+                'created': (EPOCH - SPAN + step * number).isoformat(),
+            }
+
+    def follow_records(self):
+        for user in range(self.users):
+            # Подписки равномерны: размер лент — около
+            # FOLLOWS_PER_USER * POSTS_PER_USER записей на читателя.
+            authors = {
+                self.random.randrange(self.users)
+                for _ in range(FOLLOWS_PER_USER)
+            }
+            authors.discard(user)
+            for author in sorted(authors):
+                yield user, {
+                    'user': self.username(user),
+                    'author': self.username(author),
+                }
+
+    def create(self):
+        self.seed_users()
+        FollowImporter(self.batch_size).run(self.follow_records())
+        posts = PostImporter(self.batch_size)
+        posts.run(self.post_records())
+        CommentImporter(self.batch_size).run(self.comment_records())
+        # Ленты, счётчики и кэш карточек — один раз на весь набор.
+        posts.finish()
+
+
+def percentile(values, percent):
+    """Перцентиль методом ближайшего ранга."""
+    ordered = sorted(values)
+    rank = math.ceil(percent / 100 * len(ordered))
+    return ordered[max(rank, 1) - 1]
+
+
+def scenarios():
+    """Представления posts для замера: (имя, пользователь, адреса).
+
+    Адреса берутся из самых нагруженных объектов набора: главная
+    группа, самый плодовитый автор, самый обсуждаемый пост и читатель
+    с наибольшим числом подписок.
+    """
+    group = Group.objects.order_by('-posts_count').first()
+    author = User.objects.order_by('-counter__posts_count').first()
+    post = Post.objects.order_by('-comments_count').first()
+    reader = User.objects.order_by('-counter__following_count').first()
+    deep = Post.objects.order_by('pub_date', 'id').values_list(
+        'id', flat=True
+    ).first()
+    return [
+        ('posts:index', None, [reverse('posts:index')]),
+        ('posts:index?page=N', None, [
+            f"{reverse('posts:index')}?page={page}" for page in (10, 100)
+        ]),
+        ('posts:group_list', None, [
+            reverse('posts:group_list', kwargs={'slug': group.slug})
+        ]),
+        ('posts:profile', None, [
+            reverse('posts:profile', kwargs={'username': author.username})
+        ]),
+        ('posts:post_detail', None, [
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}),
+            reverse('posts:post_detail', kwargs={'post_id': deep}),
+        ]),
+        ('posts:post_comments', None, [
+            reverse('posts:post_comments', kwargs={'post_id': post.pk})
+        ]),
+        ('posts:search', None, [
+            f"{reverse('posts:search')}?q={word}"
+            for word in ('день', 'рука', 'жизнь')
+        ]),
+        ('posts:follow_index', reader, [reverse('posts:follow_index')]),
+        ('posts:profile_export', author, [
+            reverse(
+                'posts:profile_export', kwargs={'username': author.username}
+            )
+        ]),
+        ('posts:api_index', None, [reverse('posts:api_index')]),
+        ('posts:api_post_detail', None, [
+            reverse('posts:api_post_detail', kwargs={'post_id': post.pk})
+        ]),
+        ('posts:api_follow_index', reader, [
+            reverse('posts:api_follow_index')
+        ]),
+    ]
+
+
+def measure(client, urls, requests):
+    """Прогоняет адреса по кругу requests раз и собирает метрики."""
+    timings = []
+    queries = []
+    query_times = []
+    sizes = []
+    for number in range(requests):
+        url = urls[number % len(urls)]
+        timer = QueryTimer()
+        with connection.execute_wrapper(timer):
+            started = time.perf_counter()
+            response = client.get(url)
+            if response.streaming:
+                size = sum(len(block) for block in response.streaming_content)
+            else:
+                size = len(response.content)
+            timings.append(time.perf_counter() - started)
+        if response.status_code != 200:
+            raise RuntimeError(f'{url} ответил {response.status_code}')
+        queries.append(timer.count)
+        query_times.append(timer.seconds)
+        sizes.append(size)
+    result = {
+        f'p{percent}_ms': round(percentile(timings, percent) * 1000, 2)
+        for percent in PERCENTILES
+    }
+    result.update({
+        'requests': requests,
+        'queries': max(queries),
+        'queries_mean': round(sum(queries) / requests, 2),
+        'query_ms_p50': round(percentile(query_times, 50) * 1000, 2),
+        'bytes': max(sizes),
+    })
+    return result
+
+
+def run(requests, warmup=1):
+    """Замеры всех сценариев: имя представления → метрики."""
+    results = {}
+    for name, user, urls in scenarios():
+        client = Client()
+        if user is not None:
+            client.force_login(user)
+        for url in urls[:warmup]:
+            client.get(url)
+        results[name] = measure(client, urls, requests)
+    return results
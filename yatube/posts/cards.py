@@ -0,0 +1,38 @@
+from core.versions import bump_version, get_version, get_versions
+
+INDEX_VERSION = 'index'
+
+
+def card_names(post):
+    """Имена версий, от которых зависит карточка поста."""
+    names = [f'post:{post.pk}', f'user:{post.author_id}']
+    if post.group_id is not None:
+        names.append(f'group:{post.group_id}')
+    return names
+
+
+def attach_card_versions(posts):
+    """Проставляет постам штамп версии карточки для ключа кэша.
+
+    Штампы всей страницы читаются одним запросом.
+    """
+    posts = list(posts)
+    names = list(dict.fromkeys(
+        name for post in posts for name in card_names(post)
+    ))
+    if not names:
+        return
+    versions = dict(zip(names, get_versions(*names)))
+    for post in posts:
+        post.card_version = '-'.join(
+            str(versions[name]) for name in card_names(post)
+        )
+
+
+def index_version():
+    """Поколение кэша главной: меняется при любой правке ленты."""
+    return get_version(INDEX_VERSION)
+
+
+def invalidate(*names):
+    bump_version(*names)
@@ -0,0 +1,122 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Group, Post, StoredImage, UserCounter
+
+User = get_user_model()
+
+
+def bump(queryset, field, delta):
+    """Атомарно меняет счётчик на delta прямо в базе.
+
+    Возвращает число изменённых строк: 0, если строки нет или счётчик
+    уже на нуле и уменьшать его некуда.
+    """
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def bump_group(group_id, delta):
+    if group_id is not None:
+        bump(Group.objects.filter(pk=group_id), 'posts_count', delta)
+
+
+def bump_user(user_id, field, delta):
+    queryset = UserCounter.objects.filter(user_id=user_id)
+    if not bump(queryset, field, delta) and delta > 0:
+        # Строки счётчиков ещё нет — считаем её с нуля. Уменьшения
+        # без строки пропускаем: так бывает при удалении пользователя.
+        reconcile_user(user_id)
+
+
+def acquire_image(name):
+    if not name:
+        return
+    queryset = StoredImage.objects.filter(name=name)
+    if not bump(queryset, 'references', 1):
+        _, created = StoredImage.objects.get_or_create(
+            name=name, defaults={'references': 1}
+        )
+        if not created:
+            bump(queryset, 'references', 1)
+
+
+def release_image(name):
+    """Снимает ссылку поста на файл.
+
+    Возвращает True, если ссылка была последней и запись о файле удалена.
+    """
+    if not name:
+        return False
+    bump(StoredImage.objects.filter(name=name), 'references', -1)
+    deleted, _ = StoredImage.objects.filter(name=name, references=0).delete()
+    return bool(deleted)
+
+
+def _total(model, field, outer='pk'):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(
+                **{field: OuterRef(outer)}
+            ).order_by().values(field).annotate(
+                total=Count('pk')
+            ).values('total')
+        ),
+        0
+    )
+
+
+def counter_sources():
+    """Пары (модель, поле счётчика, выражение с настоящим значением)."""
+    return [
+        (Group, 'posts_count', _total(Post, 'group')),
+        (Post, 'comments_count', _total(Comment, 'post')),
+        (UserCounter, 'posts_count', _total(Post, 'author', 'user_id')),
+        (
+            UserCounter,
+            'followers_count',
+            _total(Follow, 'author', 'user_id')
+        ),
+        (
+            UserCounter,
+            'following_count',
+            _total(Follow, 'user', 'user_id')
+        ),
+        (StoredImage, 'references', _total(Post, 'image', 'name')),
+    ]
+
+
+def reconcile_user(user_id):
+    counter, _ = UserCounter.objects.get_or_create(user_id=user_id)
+    UserCounter.objects.filter(pk=counter.pk).update(**{
+        field: expression
+        for model, field, expression in counter_sources()
+        if model is UserCounter
+    })
+
+
+def reconcile():
+    """Сверяет счётчики с таблицами и чинит расхождения.
+
+    Возвращает словарь «модель.поле → число исправленных строк».
+    """
+    UserCounter.objects.bulk_create(
+        [
+            UserCounter(user_id=pk)
+            for pk in User.objects.filter(
+                counter__isnull=True
+            ).values_list('pk', flat=True)
+        ]
+    )
+    repaired = {}
+    for model, field, expression in counter_sources():
+        drifted = model.objects.annotate(actual=expression).exclude(
+            **{field: F('actual')}
+        ).values('pk')
+        name = f'{model._meta.model_name}.{field}'
+        repaired[name] = model.objects.filter(pk__in=drifted).update(
+            **{field: expression}
+        )
+    return repaired
@@ -0,0 +1,202 @@
+import csv
+import json
+import zipfile
+from datetime import datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Comment, Follow, Post
+
+FORMATS = ('jsonl', 'csv')
+
+CONTENT_TYPES = {
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+    'zip': 'application/zip',
+}
+
+# Строк, которые база отдаёт за одно обращение курсора.
+CHUNK_SIZE = 2000
+
+# Мелкие строки склеиваются в блоки такого размера перед отдачей.
+BUFFER_SIZE = 64 * 1024
+
+IMAGE_CHUNK_SIZE = 64 * 1024
+
+# Вид записей → (модель, поле владельца, столбцы). Имена столбцов те же,
+# что понимает import_yatube, поэтому выгрузку можно загрузить обратно:
+# общий файл — видом all, файлы архива — каждый своим видом.
+EXPORTS = {
+    'posts': (Post, 'author', {
+        'id': 'id',
+        'author': 'author__username',
+        'group': 'group__slug',
+        'text': 'text',
+        'pub_date': 'pub_date',
+        'image': 'image',
+    }),
+    'comments': (Comment, 'author', {
+        'id': 'id',
+        'post': 'post_id',
+        'author': 'author__username',
+        'text': 'text',
+        'created': 'created',
+    }),
+    'follows': (Follow, 'user', {
+        'user': 'user__username',
+        'author': 'author__username',
+    }),
+}
+
+# Столбцы общего CSV, где записи всех видов идут подряд.
+CSV_COLUMNS = list(dict.fromkeys(
+    ['kind'] + [name for *_, columns in EXPORTS.values() for name in columns]
+))
+
+
+class Echo:
+    """Файл для csv.writer, который возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+class ZipBuffer:
+    """Несжимаемый поток для ZipFile: копит байты до следующего drain()."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def plain(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def records(user, kind):
+    """Записи пользователя одного вида словарями, частями по CHUNK_SIZE."""
+    model, owner, columns = EXPORTS[kind]
+    rows = model.objects.filter(**{owner: user}).order_by('pk').values(
+        *columns.values()
+    )
+    for row in rows.iterator(chunk_size=CHUNK_SIZE):
+        yield {name: plain(row[column]) for name, column in columns.items()}
+
+
+def tagged_records(user):
+    """Записи всех видов подряд, у каждой поле kind."""
+    for kind in EXPORTS:
+        for row in records(user, kind):
+            yield {'kind': kind, **row}
+
+
+def jsonl_lines(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False, cls=DjangoJSONEncoder) + '\n'
+
+
+def csv_lines(rows, columns):
+    writer = csv.DictWriter(Echo(), columns)
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def buffered(lines, size=BUFFER_SIZE):
+    """Склеивает строки в блоки байтов не больше size (с запасом в строку)."""
+    block = []
+    length = 0
+    for line in lines:
+        data = line.encode()
+        block.append(data)
+        length += len(data)
+        if length >= size:
+            yield b''.join(block)
+            block = []
+            length = 0
+    if block:
+        yield b''.join(block)
+
+
+def stream(user, data_format='jsonl'):
+    """Все записи пользователя одним файлом JSONL или CSV."""
+    if data_format == 'csv':
+        lines = csv_lines(tagged_records(user), CSV_COLUMNS)
+    else:
+        lines = jsonl_lines(tagged_records(user))
+    return buffered(lines)
+
+
+def image_names(user):
+    return (
+        Post.objects.filter(author=user).exclude(image='').order_by(
+            'image'
+        ).values_list('image', flat=True).distinct().iterator(
+            chunk_size=CHUNK_SIZE
+        )
+    )
+
+
+def zip_stream(user, data_format='jsonl', with_images=False):
+    """Архив с файлом на каждый вид записей и, по желанию, картинками.
+
+    ZipFile пишет в поток без seek(), поэтому архив отдаётся по мере
+    сборки; в памяти держится не больше одного блока.
+    """
+    buffer = ZipBuffer()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for kind, (_, _, columns) in EXPORTS.items():
+            if data_format == 'csv':
+                lines = csv_lines(records(user, kind), list(columns))
+            else:
+                lines = jsonl_lines(records(user, kind))
+            with archive.open(f'{kind}.{data_format}', 'w') as entry:
+                for block in buffered(lines):
+                    entry.write(block)
+                    yield buffer.drain()
+            yield buffer.drain()
+        if with_images:
+            storage = Post._meta.get_field('image').storage
+            for name in image_names(user):
+                if not storage.exists(name):
+                    continue
+                info = zipfile.ZipInfo(f'images/{name}')
+                # Картинки уже сжаты: повторное сжатие только тратит CPU.
+                info.compress_type = zipfile.ZIP_STORED
+                with storage.open(name) as source:
+                    with archive.open(info, 'w') as entry:
+                        for chunk in source.chunks(IMAGE_CHUNK_SIZE):
+                            entry.write(chunk)
+                            yield buffer.drain()
+                yield buffer.drain()
+    yield buffer.drain()
+
+
+def export(user, data_format='jsonl', archive=False, with_images=False):
+    """Выгрузка пользователя итератором байтов.
+
+    С archive или with_images — zip-архив, иначе один файл.
+    """
+    if archive or with_images:
+        return (
+            block for block in zip_stream(user, data_format, with_images)
+            if block
+        )
+    return stream(user, data_format)
+
+
+def extension(data_format='jsonl', archive=False, with_images=False):
+    return 'zip' if archive or with_images else data_format
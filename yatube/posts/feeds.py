@@ -0,0 +1,232 @@
+import heapq
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Follow, Post, Timeline, UserCounter
+from .paginators import KeysetPaginator
+
+FAN_OUT_BATCH = 1000
+
+
+def _push(entries):
+    entries = iter(entries)
+    batch = list(islice(entries, FAN_OUT_BATCH))
+    while batch:
+        Timeline.objects.bulk_create(batch, ignore_conflicts=True)
+        batch = list(islice(entries, FAN_OUT_BATCH))
+
+
+def unpull_limit():
+    """Порог возврата к раскладке: на десятую часть ниже FEED_FANOUT_LIMIT.
+
+    Автор у самого порога не переключается туда и обратно с каждой
+    подпиской, а значит, и не перестраивает ленты подписчиков.
+    """
+    limit = settings.FEED_FANOUT_LIMIT
+    return limit - limit // 10
+
+
+def is_pulled(author_id):
+    return UserCounter.objects.filter(user_id=author_id, pulled=True).exists()
+
+
+def pulled_authors(user):
+    """Авторы из подписок читателя, чьи посты подмешиваются при чтении.
+
+    Решение хранится в UserCounter.pulled, общем для записи и чтения
+    во всех процессах.
+    """
+    return list(
+        Follow.objects.filter(
+            user=user,
+            author__counter__pulled=True
+        ).values_list('author', flat=True)
+    )
+
+
+def start_pulling(counters):
+    """Авторов с подписчиками сверх FEED_FANOUT_LIMIT читать при открытии.
+
+    Разложенные посты этих авторов убираются из лент: иначе они
+    считались бы в числе записей ленты дважды — из Timeline и при чтении.
+    """
+    started = counters.filter(
+        pulled=False,
+        followers_count__gt=settings.FEED_FANOUT_LIMIT
+    ).update(pulled=True)
+    if started:
+        Timeline.objects.filter(
+            post__author_id__in=counters.filter(
+                pulled=True
+            ).values('user_id')
+        ).delete()
+
+
+def stop_pulling(counters):
+    """Авторов, опустившихся до unpull_limit(), снова раскладывать.
+
+    Сначала все посты автора дописываются в ленты текущих подписчиков
+    и только потом снимается флаг: посты не пропадают из лент ни на миг.
+    Это число подписчиков × число постов вставок, поэтому вызывается
+    не из запроса, а из reconcile_counters и после импорта.
+    """
+    returning = list(counters.filter(
+        pulled=True,
+        followers_count__lte=unpull_limit()
+    ).values_list('user_id', flat=True))
+    for author_id in returning:
+        with transaction.atomic():
+            followers = Follow.objects.filter(
+                author_id=author_id
+            ).values_list('user_id', flat=True)
+            for user_id in followers.iterator(chunk_size=FAN_OUT_BATCH):
+                _backfill(user_id, author_id)
+            UserCounter.objects.filter(user_id=author_id).update(
+                pulled=False
+            )
+
+
+def update_pulled(author_ids=None):
+    """Сверяет флаги pulled с числом подписчиков, например после импорта."""
+    counters = UserCounter.objects.all()
+    if author_ids is not None:
+        counters = counters.filter(user_id__in=author_ids)
+    start_pulling(counters)
+    stop_pulling(counters)
+
+
+def fan_out(post):
+    """Раскладывает новый пост в ленты подписчиков автора."""
+    if is_pulled(post.author_id):
+        return
+    followers = Follow.objects.filter(author_id=post.author_id).values_list(
+        'user_id',
+        flat=True
+    )
+    _push(
+        Timeline(user_id=user_id, post_id=post.pk, pub_date=post.pub_date)
+        for user_id in followers.iterator(chunk_size=FAN_OUT_BATCH)
+    )
+
+
+def _backfill(user_id, author_id):
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'pk',
+        'pub_date'
+    )
+    _push(
+        Timeline(user_id=user_id, post_id=pk, pub_date=pub_date)
+        for pk, pub_date in posts.iterator(chunk_size=FAN_OUT_BATCH)
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту читателя все посты автора после подписки."""
+    if not is_pulled(author_id):
+        _backfill(user_id, author_id)
+
+
+def prune(user_id, author_id):
+    """Убирает посты автора из ленты читателя после отписки."""
+    Timeline.objects.filter(
+        user_id=user_id,
+        post__author_id=author_id
+    ).delete()
+
+
+def rebuild(users=None):
+    """Пересобирает ленты с нуля по текущим подпискам."""
+    follows = Follow.objects.all()
+    timelines = Timeline.objects.all()
+    if users is not None:
+        follows = follows.filter(user__in=users)
+        timelines = timelines.filter(user__in=users)
+    follows = follows.exclude(author__counter__pulled=True)
+    with transaction.atomic():
+        timelines.delete()
+        for user_id, author_id in follows.values_list('user_id', 'author_id'):
+            _backfill(user_id, author_id)
+
+
+class TimelinePaginator(KeysetPaginator):
+    """Лента подписок, прочитанная из материализованной таблицы Timeline.
+
+    Страница — один диапазон индекса (user, pub_date, post) без
+    соединения с таблицей подписок.
+    """
+
+    def __init__(self, object_list, per_page, **kwargs):
+        kwargs.setdefault('keys', ('pub_date', 'post_id'))
+        super().__init__(self.entries(object_list), per_page, **kwargs)
+
+    def entries(self, timeline):
+        return timeline.select_related('post__author', 'post__group')
+
+    def entry_post(self, entry):
+        return entry.post
+
+    def key_values(self, post):
+        return [post.pub_date, post.pk]
+
+    def fetch(self, *args, **kwargs):
+        return [
+            self.entry_post(entry)
+            for entry in super().fetch(*args, **kwargs)
+        ]
+
+
+def _unique(posts, key):
+    previous = None
+    for post in posts:
+        current = key(post)
+        if current != previous:
+            yield post
+        previous = current
+
+
+class FeedPaginator(TimelinePaginator):
+    """Гибридная лента: разложенные посты из Timeline плюс посты
+    популярных авторов, прочитанные в момент запроса.
+
+    Каждый источник отдаёт не больше страницы по своему индексу, затем
+    источники сливаются кучей (k-way merge) по (pub_date, id).
+    """
+
+    def __init__(self, object_list, per_page, authors=(), **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.sources = [
+            KeysetPaginator(self.author_posts(author_id), per_page)
+            for author_id in authors
+        ]
+
+    def author_posts(self, author_id):
+        return Post.objects.select_related('author', 'group').filter(
+            author_id=author_id
+        )
+
+    def total(self):
+        return super().total() + sum(
+            source.total() for source in self.sources
+        )
+
+    def fetch(self, values=None, reverse=False, offset=0, limit=None):
+        # Чтобы отдать строки [offset, offset + limit) слияния, от каждого
+        # источника достаточно первых offset + limit строк.
+        depth = offset + limit
+        streams = [super().fetch(values, reverse, limit=depth)]
+        streams += [
+            source.fetch(values, reverse, limit=depth)
+            for source in self.sources
+        ]
+        merged = heapq.merge(
+            *streams,
+            key=lambda post: tuple(self.key_values(post)),
+            reverse=not reverse
+        )
+        return list(islice(
+            _unique(merged, lambda post: self.key_values(post)[1]),
+            offset,
+            depth
+        ))
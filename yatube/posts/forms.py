@@ -1,6 +1,10 @@
 from django import forms
+from django.contrib.auth import get_user_model
 
-from .models import Comment, Post, Word
+from .models import Comment, Group, Post
+from .words import get_matcher
+
+User = get_user_model()
 
 
 class PostForm(forms.ModelForm):
@@ -15,11 +19,27 @@ class CommentForm(forms.ModelForm):
         fields = ('text',)
 
     def clean_text(self):
-        words = Word.objects.values_list('word', flat=True)
         data = self.cleaned_data['text']
-        for word in words:
-            if word in data.lower():
-                raise forms.ValidationError(
-                    f'Вы использовали запретное слово «{word}»!'
-                )
+        word = get_matcher().find(data.lower())
+        if word is not None:
+            raise forms.ValidationError(
+                f'Вы использовали запретное слово «{word}»!'
+            )
         return data
+
+
+class SearchForm(forms.Form):
+    q = forms.CharField(label='Что искать', max_length=200)
+    group = forms.ModelChoiceField(
+        Group.objects.all(),
+        label='Группа',
+        to_field_name='slug',
+        required=False
+    )
+    author = forms.ModelChoiceField(
+        User.objects.all(),
+        label='Автор',
+        to_field_name='username',
+        required=False,
+        widget=forms.TextInput
+    )
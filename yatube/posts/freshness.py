@@ -0,0 +1,118 @@
+import hashlib
+from datetime import datetime, timezone
+
+from django.db.models import OuterRef, Subquery
+from django.views.decorators.http import condition
+
+from core.versions import bump_version, get_versions
+
+from .cards import INDEX_VERSION, card_names
+from .models import Comment, Post
+
+
+def follows_version(user_id):
+    return f'follows:{user_id}'
+
+
+def bump_follows(user_id):
+    bump_version(follows_version(user_id))
+
+
+def comments_version(post_id):
+    return f'comments:{post_id}'
+
+
+def bump_comments(*post_ids):
+    bump_version(*(comments_version(post_id) for post_id in post_ids))
+
+
+def conditional(freshness):
+    """condition() с одной функцией свежести на ETag и Last-Modified.
+
+    freshness(request, *args, **kwargs) возвращает (части ETag, время
+    изменения) или None, если валидаторов нет. Считается один раз на
+    запрос, страница при этом не рендерится. ETag включает пользователя:
+    шапка и кнопки страниц у каждого свои.
+    """
+    def validators(request, *args, **kwargs):
+        if not hasattr(request, '_validators'):
+            request._validators = (None, None)
+            result = freshness(request, *args, **kwargs)
+            if result is not None:
+                parts, modified = result
+                viewer = request.user.pk or 0
+                payload = ':'.join(map(str, (viewer, *parts)))
+                request._validators = (
+                    hashlib.md5(payload.encode()).hexdigest(),
+                    datetime.fromtimestamp(modified, timezone.utc)
+                )
+        return request._validators
+
+    return condition(
+        etag_func=lambda *args, **kwargs: validators(*args, **kwargs)[0],
+        last_modified_func=(
+            lambda *args, **kwargs: validators(*args, **kwargs)[1]
+        )
+    )
+
+
+def versions_freshness(*names):
+    stamps = get_versions(*names)
+    return stamps, max(stamps)
+
+
+def feed_freshness(request, *args, **kwargs):
+    """Ленты index и group_posts: любая правка поста сдвигает поколение."""
+    return versions_freshness(INDEX_VERSION)
+
+
+def profile_freshness(request, username):
+    # Кнопка «Подписаться/Отписаться» зависит от подписок зрителя.
+    return versions_freshness(
+        INDEX_VERSION, follows_version(request.user.pk or 0)
+    )
+
+
+def follow_freshness(request):
+    """Лента подписок: правка любого поста или подписок читателя."""
+    if not request.user.is_authenticated:
+        return None
+    return versions_freshness(
+        INDEX_VERSION, follows_version(request.user.pk)
+    )
+
+
+def post_freshness(request, post_id):
+    last_comment = Comment.objects.filter(
+        post=OuterRef('pk')
+    ).order_by('-created', '-id').values('created')[:1]
+    post = Post.objects.filter(pk=post_id).annotate(
+        last_comment=Subquery(last_comment)
+    ).values(
+        'id',
+        'author_id',
+        'group_id',
+        'comments_count',
+        'author__counter__posts_count',
+        'last_comment'
+    ).first()
+    if post is None:
+        return None
+    # Штамп комментариев меняет и правка текста в админке: время
+    # и число комментариев при ней остаются прежними.
+    names = card_names(Post(
+        pk=post['id'], author_id=post['author_id'], group_id=post['group_id']
+    ))
+    names.append(comments_version(post['id']))
+    versions = versions_freshness(*names)
+    if versions is None:
+        return None
+    stamps, modified = versions
+    if post['last_comment'] is not None:
+        modified = max(modified, post['last_comment'].timestamp())
+    return [
+        *stamps,
+        post['comments_count'],
+        post['author__counter__posts_count'],
+        post['last_comment']
+    ], modified
@@ -0,0 +1,381 @@
+import csv
+import json
+import time
+from contextlib import contextmanager, nullcontext
+from itertools import groupby, islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.versions import bump_version
+
+from . import cards, counters, feeds
+from .freshness import bump_comments, follows_version
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+
+FORMATS = ('jsonl', 'csv')
+
+
+class RecordError(ValueError):
+    """Запись нельзя импортировать: не хватает полей или связей."""
+
+
+def read_records(stream, data_format):
+    """Записи файла по одной, не читая его в память целиком.
+
+    Отдаёт пары (номер строки, словарь полей).
+    """
+    if data_format == 'csv':
+        # Первая строка CSV — заголовок, данные начинаются со второй.
+        for number, record in enumerate(csv.DictReader(stream), 2):
+            yield number, record
+        return
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            raise RecordError(f'строка {number}: {exc}')
+        yield number, record
+
+
+@contextmanager
+def preserve_dates(model, name):
+    """Отключает auto_now_add, чтобы bulk_create сохранил дату из файла."""
+    field = model._meta.get_field(name)
+    saved = field.auto_now_add
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = saved
+
+
+def parse_date(value):
+    if not value:
+        return timezone.now()
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise RecordError(f'некорректная дата «{value}»')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, timezone.utc)
+    return parsed
+
+
+def required(record, name):
+    value = record.get(name)
+    if value in (None, ''):
+        raise RecordError(f'нет поля {name}')
+    return value
+
+
+def optional_id(record):
+    value = record.get('id')
+    return int(value) if value not in (None, '') else None
+
+
+class Importer:
+    """Пакетная загрузка записей одной модели.
+
+    Записи копятся в пачки по batch_size и пишутся одним bulk_create,
+    каждая пачка — в своей транзакции. Ошибочные записи пропускаются
+    и попадают в skipped с номером строки. Сигналы post_save при этом
+    не срабатывают: ленты и счётчики пересобираются в finish().
+    """
+
+    model = None
+    date_field = None
+
+    def __init__(self, batch_size=BATCH_SIZE):
+        self.batch_size = batch_size
+        self.imported = 0
+        self.skipped = []
+
+    def prepare(self, records):
+        """Вызывается с пачкой записей перед build(): дозагрузка связей."""
+
+    def build(self, record):
+        raise NotImplementedError
+
+    def build_batch(self, records):
+        self.prepare([record for _, record in records])
+        objects = []
+        for number, record in records:
+            try:
+                objects.append(self.build(record))
+            except (RecordError, KeyError, TypeError, ValueError) as exc:
+                self.skipped.append((number, str(exc)))
+        return objects
+
+    def insert(self, objects):
+        # Размер INSERT выбирает сама база: у SQLite свой предел
+        # на число параметров и слагаемых составного SELECT.
+        self.model.objects.bulk_create(objects)
+
+    def run(self, records, progress=None):
+        """Загружает записи; progress(imported, seconds) после каждой пачки."""
+        records = iter(records)
+        started = time.monotonic()
+        batch = list(islice(records, self.batch_size))
+        context = (
+            preserve_dates(self.model, self.date_field)
+            if self.date_field else nullcontext()
+        )
+        with context:
+            while batch:
+                objects = self.build_batch(batch)
+                with transaction.atomic():
+                    self.insert(objects)
+                    self.after_insert(objects)
+                self.imported += len(objects)
+                if progress is not None:
+                    progress(self.imported, time.monotonic() - started)
+                batch = list(islice(records, self.batch_size))
+        return self.imported
+
+    def after_insert(self, objects):
+        pass
+
+    def finish(self):
+        """Приводит производные данные в порядок после загрузки."""
+        counters.reconcile()
+        cards.invalidate(cards.INDEX_VERSION)
+
+
+class UsernameMap:
+    """Имя пользователя → pk; в память читаются только нужные имена."""
+
+    def __init__(self):
+        self.ids = {}
+
+    def load(self, usernames):
+        missing = {name for name in usernames if name not in self.ids}
+        missing.discard(None)
+        if missing:
+            self.ids.update(
+                User.objects.filter(
+                    username__in=missing
+                ).values_list('username', 'pk')
+            )
+
+    def __getitem__(self, username):
+        try:
+            return self.ids[username]
+        except KeyError:
+            raise RecordError(f'нет пользователя {username}')
+
+
+class UserImporter(Importer):
+    model = User
+
+    def build(self, record):
+        return User(
+            username=required(record, 'username'),
+            email=record.get('email') or '',
+            first_name=record.get('first_name') or '',
+            last_name=record.get('last_name') or '',
+            # Пароли не переносятся: войти можно после сброса пароля.
+            password=make_password(None),
+            date_joined=parse_date(record.get('date_joined'))
+        )
+
+
+class GroupImporter(Importer):
+    model = Group
+
+    def build(self, record):
+        return Group(
+            title=required(record, 'title'),
+            slug=required(record, 'slug'),
+            description=record.get('description') or ''
+        )
+
+
+class PostImporter(Importer):
+    """Посты: author — имя пользователя, group — адрес группы.
+
+    Если в записи есть id, он сохраняется: на него ссылаются
+    комментарии того же выгруза.
+    """
+
+    model = Post
+    date_field = 'pub_date'
+
+    def __init__(self, batch_size=BATCH_SIZE):
+        super().__init__(batch_size)
+        self.authors = UsernameMap()
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+
+    def prepare(self, records):
+        self.authors.load(record.get('author') for record in records)
+
+    def build(self, record):
+        slug = record.get('group') or None
+        if slug is not None and slug not in self.groups:
+            raise RecordError(f'нет группы {slug}')
+        return Post(
+            pk=optional_id(record),
+            author_id=self.authors[record.get('author')],
+            group_id=self.groups.get(slug),
+            text=required(record, 'text'),
+            pub_date=parse_date(record.get('pub_date')),
+            image=record.get('image') or ''
+        )
+
+    def finish(self):
+        feeds.rebuild()
+        super().finish()
+
+
+class CommentImporter(Importer):
+    """Комментарии: post — id поста, author — имя пользователя."""
+
+    model = Comment
+    date_field = 'created'
+
+    def __init__(self, batch_size=BATCH_SIZE):
+        super().__init__(batch_size)
+        self.authors = UsernameMap()
+        self.posts = set()
+
+    def prepare(self, records):
+        self.authors.load(record.get('author') for record in records)
+        post_ids = {
+            int(record['post']) for record in records
+            if str(record.get('post') or '').isdigit()
+        }
+        self.posts = set(
+            Post.objects.filter(pk__in=post_ids).values_list('pk', flat=True)
+        )
+
+    def build(self, record):
+        post_id = int(required(record, 'post'))
+        if post_id not in self.posts:
+            raise RecordError(f'нет поста {post_id}')
+        return Comment(
+            pk=optional_id(record),
+            post_id=post_id,
+            author_id=self.authors[record.get('author')],
+            text=required(record, 'text'),
+            created=parse_date(record.get('created'))
+        )
+
+    def after_insert(self, objects):
+        bump_comments(*{comment.post_id for comment in objects})
+
+
+class FollowImporter(Importer):
+    """Подписки: user и author — имена пользователей."""
+
+    model = Follow
+
+    def __init__(self, batch_size=BATCH_SIZE):
+        super().__init__(batch_size)
+        self.users = UsernameMap()
+        self.readers = set()
+
+    def prepare(self, records):
+        self.users.load(
+            name for record in records
+            for name in (record.get('user'), record.get('author'))
+        )
+
+    def build(self, record):
+        user_id = self.users[record.get('user')]
+        author_id = self.users[record.get('author')]
+        if user_id == author_id:
+            raise RecordError('подписка на самого себя')
+        return Follow(user_id=user_id, author_id=author_id)
+
+    def insert(self, objects):
+        # Повторная подписка уже есть в базе — её просто пропускаем.
+        Follow.objects.bulk_create(objects, ignore_conflicts=True)
+
+    def after_insert(self, objects):
+        self.readers.update(follow.user_id for follow in objects)
+
+    def finish(self):
+        # Сначала счётчики подписчиков: по ним решается, чьи посты
+        # раскладывать по лентам.
+        super().finish()
+        feeds.update_pulled()
+        readers = iter(sorted(self.readers))
+        chunk = list(islice(readers, self.batch_size))
+        while chunk:
+            feeds.rebuild(chunk)
+            bump_version(*(follows_version(user_id) for user_id in chunk))
+            chunk = list(islice(readers, self.batch_size))
+
+
+IMPORTERS = {
+    'users': UserImporter,
+    'groups': GroupImporter,
+    'posts': PostImporter,
+    'comments': CommentImporter,
+    'follows': FollowImporter,
+}
+
+
+class MixedImporter:
+    """Записи разных видов в одном файле, вид — в поле kind.
+
+    Так выглядит выгрузка export_yatube без архива. Подряд идущие
+    записи одного вида уходят загрузчику этого вида; загрузчики
+    создаются при первой записи своего вида и доводятся в finish()
+    в порядке IMPORTERS.
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE):
+        self.batch_size = batch_size
+        self.importers = {}
+        self.unknown = []
+
+    @property
+    def imported(self):
+        return sum(
+            importer.imported for importer in self.importers.values()
+        )
+
+    @property
+    def skipped(self):
+        return sorted(self.unknown + [
+            skipped for importer in self.importers.values()
+            for skipped in importer.skipped
+        ])
+
+    def run(self, records, progress=None):
+        started = time.monotonic()
+
+        def report(imported, seconds):
+            progress(self.imported, time.monotonic() - started)
+
+        for kind, group in groupby(
+            records, key=lambda item: item[1].get('kind')
+        ):
+            if kind not in IMPORTERS:
+                self.unknown.extend(
+                    (number, f'неизвестный вид записи {kind}')
+                    for number, _ in group
+                )
+                continue
+            if kind not in self.importers:
+                self.importers[kind] = IMPORTERS[kind](self.batch_size)
+            self.importers[kind].run(group, progress and report)
+        return self.imported
+
+    def finish(self):
+        for kind in IMPORTERS:
+            if kind in self.importers:
+                self.importers[kind].finish()
+
+
+# Вид для import_yatube: выгрузка export_yatube одним файлом.
+MIXED = 'all'
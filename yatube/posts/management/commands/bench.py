@@ -0,0 +1,97 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+
+from posts import bench
+
+DUMMY_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    }
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет отдельную базу детерминированным набором данных '
+        '(10k, 100k или 1m постов), прогоняет представления posts через '
+        'тестовый клиент и выводит JSON с перцентилями времени ответа, '
+        'числом и временем запросов к базе и размером ответа.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--size',
+            default='10k',
+            help='Число постов: 10k, 100k, 1m или любое число.'
+        )
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=bench.SEED)
+        parser.add_argument(
+            '--database',
+            help='Файл SQLite для набора; по умолчанию bench-<size>.sqlite3 '
+                 'рядом с manage.py. Готовый набор используется повторно.'
+        )
+        parser.add_argument(
+            '--reseed',
+            action='store_true',
+            help='Создать набор заново, даже если файл уже есть.'
+        )
+        parser.add_argument(
+            '--cold',
+            action='store_true',
+            help='Мерить без кэша (DummyCache).'
+        )
+        parser.add_argument('--output', help='Записать JSON в файл.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Замеры рассчитаны на SQLite.')
+        if options['requests'] < 1:
+            raise CommandError('--requests должен быть положительным.')
+        try:
+            posts = bench.parse_size(options['size'])
+        except ValueError as exc:
+            raise CommandError(exc)
+        dataset = bench.Dataset(posts, seed=options['seed'])
+        old_name = connection.settings_dict['NAME']
+        connection.settings_dict['TEST']['NAME'] = options['database'] or (
+            os.path.join(settings.BASE_DIR, f'bench-{posts}.sqlite3')
+        )
+        # Рабочая база не трогается: набор живёт в своём файле и
+        # переиспользуется между запусками.
+        connection.creation.create_test_db(
+            verbosity=0, serialize=False, keepdb=True
+        )
+        try:
+            report = self.run(dataset, options)
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=True
+            )
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+    def run(self, dataset, options):
+        if options['reseed'] or not dataset.is_seeded():
+            self.stderr.write(f'Заполнение базы: {dataset.summary()}')
+            # Остатки прерванного заполнения удаляются вместе со всем.
+            call_command('flush', interactive=False, verbosity=0)
+            dataset.create()
+        caches = DUMMY_CACHES if options['cold'] else settings.CACHES
+        with override_settings(DEBUG=False, CACHES=caches):
+            views = bench.run(options['requests'])
+        return {
+            'dataset': dataset.summary(),
+            'cache': not options['cold'],
+            'views': views,
+        }
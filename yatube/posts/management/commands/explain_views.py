@@ -0,0 +1,164 @@
+import json
+import re
+from urllib.parse import urlencode
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Follow, Group, Post
+from posts.search import WORD
+
+User = get_user_model()
+
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?\S+$')
+
+TEMP_SORT = 'USE TEMP B-TREE'
+
+# Поиск сортирует по релевантности bm25: для неё индекса нет, и
+# временное B-дерево строится только по найденным строкам.
+FULL_TEXT = ' MATCH '
+
+DUMMY_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    }
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет представления posts, снимает их SQL и проверяет план '
+        'каждого запроса через EXPLAIN QUERY PLAN: полный просмотр '
+        'таблицы или сортировка во временном B-дереве считаются ошибкой.'
+    )
+
+    def get_pages(self):
+        """Адреса для проверки на данных текущей базы.
+
+        Каждое представление posts, отвечающее на GET, — и страницы,
+        и API: (имя, пользователь или None, адрес).
+        """
+        pages = [
+            ('posts:index', None, reverse('posts:index')),
+            ('posts:api_index', None, reverse('posts:api_index')),
+        ]
+        group = Group.objects.annotate(
+            total=Count('posts')
+        ).order_by('-total').first()
+        if group is not None:
+            for name in ('posts:group_list', 'posts:api_group_list'):
+                pages.append((
+                    name, None, reverse(name, kwargs={'slug': group.slug})
+                ))
+        author = User.objects.annotate(
+            total=Count('posts')
+        ).order_by('-total').first()
+        if author is not None:
+            for name in ('posts:profile', 'posts:api_profile'):
+                pages.append((
+                    name,
+                    None,
+                    reverse(name, kwargs={'username': author.username})
+                ))
+        post = Post.objects.annotate(
+            total=Count('comments')
+        ).order_by('-total').first()
+        if post is not None:
+            for name in (
+                'posts:post_detail',
+                'posts:post_comments',
+                'posts:api_post_detail',
+                'posts:api_post_comments',
+            ):
+                pages.append((
+                    name, None, reverse(name, kwargs={'post_id': post.pk})
+                ))
+            word = WORD.search(post.text)
+            if word is not None:
+                query = urlencode({'q': word.group()})
+                pages.append((
+                    'posts:search', None, f'{reverse("posts:search")}?{query}'
+                ))
+        follow = Follow.objects.select_related('user').first()
+        if follow is not None:
+            for name in ('posts:follow_index', 'posts:api_follow_index'):
+                pages.append((name, follow.user, reverse(name)))
+        return pages
+
+    def capture(self, client, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        if response.status_code != 200:
+            raise CommandError(f'{url} ответил {response.status_code}')
+        return response, [query['sql'] for query in queries]
+
+    def next_urls(self, url, response):
+        """Вторая страница ответа: по курсору и, у страниц, по номеру."""
+        separator = '&' if '?' in url else '?'
+        context = response.context or {}
+        page_obj = context.get('page_obj')
+        if response['Content-Type'].startswith('application/json'):
+            cursor = json.loads(response.content).get('next')
+        else:
+            cursor = getattr(page_obj or context.get('comments'),
+                             'next_cursor', None)
+        urls = []
+        if cursor:
+            urls.append(f'{url}{separator}after={cursor}')
+        if page_obj is not None and page_obj.has_next():
+            urls.append(f'{url}{separator}page=2')
+        return urls
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def check_plan(self, plan, full_text=False):
+        # SCAN без индекса плох только для таблицы базы: подзапросы
+        # вроде (subquery-3) или found — уже отобранные строки.
+        tables = self.tables
+        return [
+            step for step in plan
+            if FULL_SCAN.match(step) and step.split()[-1] in tables
+            or TEMP_SORT in step and not full_text
+        ]
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('EXPLAIN QUERY PLAN есть только у SQLite.')
+        self.tables = set(connection.introspection.table_names())
+        failures = []
+        with override_settings(DEBUG=False, CACHES=DUMMY_CACHES):
+            for name, user, url in self.get_pages():
+                client = Client()
+                if user is not None:
+                    client.force_login(user)
+                response, queries = self.capture(client, url)
+                for next_url in self.next_urls(url, response):
+                    queries += self.capture(client, next_url)[1]
+                failures += self.report(name, queries, options['verbosity'])
+        if failures:
+            raise CommandError(
+                'Запросы без подходящего индекса:\n' + '\n'.join(failures)
+            )
+        self.stdout.write(self.style.SUCCESS('Все планы используют индексы.'))
+
+    def report(self, name, queries, verbosity):
+        failures = []
+        for sql in queries:
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            plan = self.explain(sql)
+            bad_steps = self.check_plan(plan, full_text=FULL_TEXT in sql)
+            if verbosity >= 2 or bad_steps:
+                self.stdout.write(f'{name}: {sql}')
+                for step in plan:
+                    self.stdout.write(f'    {step}')
+            failures += [f'{name}: {step}\n    {sql}' for step in bad_steps]
+        return failures
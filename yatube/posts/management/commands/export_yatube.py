@@ -0,0 +1,59 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.export import FORMATS, export, extension
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты, комментарии и подписки пользователя в JSONL '
+        'или CSV, по желанию — zip-архивом вместе с картинками.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('--format', choices=FORMATS, default=FORMATS[0])
+        parser.add_argument(
+            '--zip',
+            action='store_true',
+            help='Файл на каждый вид записей в одном zip-архиве.'
+        )
+        parser.add_argument(
+            '--images',
+            action='store_true',
+            help='Добавить в архив картинки постов.'
+        )
+        parser.add_argument(
+            '--output',
+            help='Куда писать; по умолчанию <username>-export.<расширение>, '
+                 '«-» — stdout.'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f'Нет пользователя {options["username"]}.')
+        arguments = (options['format'], options['zip'], options['images'])
+        blocks = export(user, *arguments)
+        output = (
+            options['output']
+            or f'{user.username}-export.{extension(*arguments)}'
+        )
+        if output == '-':
+            for block in blocks:
+                sys.stdout.buffer.write(block)
+            sys.stdout.buffer.flush()
+            return
+        size = 0
+        with open(output, 'wb') as file:
+            for block in blocks:
+                file.write(block)
+                size += len(block)
+        self.stdout.write(self.style.SUCCESS(
+            f'Записано {size} байт в {output}.'
+        ))
@@ -0,0 +1,101 @@
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from posts.importer import (BATCH_SIZE, FORMATS, IMPORTERS, MIXED,
+                            MixedImporter, RecordError, read_records)
+
+# Прогресс печатается не чаще раза в столько секунд.
+PROGRESS_INTERVAL = 1
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает пользователей, группы, посты, комментарии или подписки '
+        'из JSONL или CSV пачками bulk_create. Файлы одного выгруза '
+        'загружаются по порядку: users, groups, posts, comments, follows. '
+        f'Вид {MIXED} — файл выгрузки export_yatube, где вид каждой записи '
+        'в поле kind.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=[*IMPORTERS, MIXED])
+        parser.add_argument('path', help='Файл с записями; «-» — stdin.')
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            help='Формат файла; по умолчанию — по расширению.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Записей в одной пачке и одной транзакции.'
+        )
+
+    def get_format(self, options):
+        if options['format']:
+            return options['format']
+        extension = os.path.splitext(options['path'])[1].lstrip('.').lower()
+        if extension not in FORMATS:
+            raise CommandError(
+                'Не удалось определить формат файла, укажите --format.'
+            )
+        return extension
+
+    def open(self, path):
+        if path == '-':
+            return sys.stdin
+        try:
+            return open(path, encoding='utf-8', newline='')
+        except OSError as exc:
+            raise CommandError(exc)
+
+    def progress(self, imported, seconds):
+        now = time.monotonic()
+        if now - self.reported < PROGRESS_INTERVAL:
+            return
+        self.reported = now
+        self.stdout.write(
+            f'Загружено {imported} записей, '
+            f'{imported / max(seconds, 1e-6):.0f} в секунду'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть положительным.')
+        data_format = self.get_format(options)
+        importer = (
+            MixedImporter if options['kind'] == MIXED
+            else IMPORTERS[options['kind']]
+        )(options['batch_size'])
+        self.reported = time.monotonic()
+        started = time.monotonic()
+        stream = self.open(options['path'])
+        error = None
+        try:
+            importer.run(read_records(stream, data_format), self.progress)
+        except (RecordError, IntegrityError) as exc:
+            error = exc
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        seconds = time.monotonic() - started
+        # Уже записанные пачки остаются в базе: ленты и счётчики
+        # приводятся в порядок и после прерванной загрузки.
+        importer.finish()
+        if error is not None:
+            raise CommandError(
+                f'Загрузка прервана после {importer.imported} записей: '
+                f'{error}'
+            )
+        for number, reason in importer.skipped:
+            self.stderr.write(f'Строка {number} пропущена: {reason}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено {importer.imported} записей за {seconds:.1f} с '
+            f'({importer.imported / max(seconds, 1e-6):.0f} в секунду), '
+            f'пропущено {len(importer.skipped)}.'
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = (
+        'Восстанавливает таблицы FTS5 и триггеры поиска и заново '
+        'индексирует тексты постов и комментариев.'
+    )
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            raise CommandError('Полнотекстовый индекс есть только у SQLite.')
+        search.rebuild()
+        self.stdout.write(self.style.SUCCESS('Поисковый индекс пересобран.'))
@@ -0,0 +1,30 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts import feeds
+from posts.models import Timeline
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает материализованные ленты подписок с нуля.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames',
+            nargs='*',
+            help='Пересобрать ленты только этих пользователей.'
+        )
+
+    def handle(self, *args, **options):
+        users = None
+        if options['usernames']:
+            users = User.objects.filter(username__in=options['usernames'])
+        feeds.rebuild(users)
+        entries = Timeline.objects.all()
+        if users is not None:
+            entries = entries.filter(user__in=users)
+        self.stdout.write(
+            self.style.SUCCESS(f'Записей в лентах: {entries.count()}')
+        )
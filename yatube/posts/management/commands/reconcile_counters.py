@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.counters import reconcile
+from posts.feeds import update_pulled
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает денормализованные счётчики, чинит расхождения '
+        'и возвращает в ленты авторов, у которых стало меньше подписчиков.'
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            repaired = reconcile()
+        # Возврат авторов в ленты идёт своими транзакциями, по автору
+        # на каждую, и не держит блокировку записи всё время.
+        update_pulled()
+        for name, rows in repaired.items():
+            self.stdout.write(f'{name}: исправлено строк — {rows}')
+        self.stdout.write(self.style.SUCCESS('Счётчики сверены.'))
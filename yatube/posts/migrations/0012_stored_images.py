@@ -0,0 +1,48 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:11
+
+from django.db import migrations, models
+from django.db.models import Count
+import posts.storage
+
+
+def fill_stored_images(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    StoredImage = apps.get_model('posts', 'StoredImage')
+    images = Post.objects.exclude(image='').values('image').annotate(
+        total=Count('pk')
+    ).order_by()
+    StoredImage.objects.bulk_create(
+        [
+            StoredImage(name=image['image'], references=image['total'])
+            for image in images.iterator()
+        ],
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredImage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Файл')),
+                ('references', models.PositiveIntegerField(default=0, verbose_name='Число ссылок')),
+            ],
+            options={
+                'verbose_name': 'Сохранённое изображение',
+                'verbose_name_plural': 'Сохранённые изображения',
+            },
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, storage=posts.storage.ContentAddressedStorage(), upload_to='posts/', verbose_name='Картинка'),
+        ),
+        migrations.RunPython(fill_stored_images, migrations.RunPython.noop),
+    ]
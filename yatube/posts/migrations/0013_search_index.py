@@ -0,0 +1,54 @@
+from django.db import migrations
+
+TABLES = (
+    ('posts_post_fts', 'posts_post'),
+    ('posts_comment_fts', 'posts_comment'),
+)
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for fts, table in TABLES:
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {fts} USING fts5("
+            f"text, content='{table}', content_rowid='id', "
+            f"tokenize='unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            f'CREATE TRIGGER {fts}_insert AFTER INSERT ON {table} '
+            f'BEGIN INSERT INTO {fts}(rowid, text) VALUES (new.id, new.text); '
+            f'END'
+        )
+        schema_editor.execute(
+            f'CREATE TRIGGER {fts}_delete AFTER DELETE ON {table} '
+            f"BEGIN INSERT INTO {fts}({fts}, rowid, text) "
+            f"VALUES ('delete', old.id, old.text); END"
+        )
+        schema_editor.execute(
+            f'CREATE TRIGGER {fts}_update AFTER UPDATE OF text ON {table} '
+            f"BEGIN INSERT INTO {fts}({fts}, rowid, text) "
+            f"VALUES ('delete', old.id, old.text); "
+            f'INSERT INTO {fts}(rowid, text) VALUES (new.id, new.text); END'
+        )
+        schema_editor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for fts, table in TABLES:
+        for action in ('insert', 'delete', 'update'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {fts}_{action}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {fts}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_stored_images'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
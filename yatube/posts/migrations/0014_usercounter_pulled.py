@@ -0,0 +1,28 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_pulled(apps, schema_editor):
+    # Посты этих авторов и раньше не раскладывались по лентам.
+    UserCounter = apps.get_model('posts', 'UserCounter')
+    UserCounter.objects.filter(
+        followers_count__gt=settings.FEED_FANOUT_LIMIT
+    ).update(pulled=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usercounter',
+            name='pulled',
+            field=models.BooleanField(db_index=True, default=False, verbose_name='Посты читаются при открытии ленты'),
+        ),
+        migrations.RunPython(mark_pulled, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from .storage import ContentAddressedStorage
+
 User = get_user_model()
 
 NUMBER_OF_LETTERS = 15
@@ -10,11 +12,17 @@ class Group(models.Model):
     title = models.CharField('Название', max_length=200)
     slug = models.SlugField('Адрес', unique=True)
     description = models.TextField('Описание')
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
 
     class Meta:
         ordering = ('title',)
         verbose_name = 'Группа'
         verbose_name_plural = 'Группы'
+        indexes = [
+            # Список групп (форма поиска, выбор группы поста) читается
+            # по индексу в нужном порядке, без сортировки.
+            models.Index(fields=['title'], name='group_title_idx')
+        ]
 
     def __str__(self) -> str:
         return self.title
@@ -47,13 +55,32 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0
+    )
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(
+                fields=['pub_date', 'id'],
+                name='post_pub_date_idx'
+            ),
+            models.Index(
+                fields=['author', 'pub_date', 'id'],
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', 'pub_date', 'id'],
+                name='post_group_pub_date_idx'
+            )
+        ]
 
     def __str__(self) -> str:
         return self.text[:NUMBER_OF_LETTERS]
@@ -85,6 +112,12 @@ class Comment(models.Model):
         ordering = ('-created',)
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(
+                fields=['post', 'created', 'id'],
+                name='comment_post_created_idx'
+            )
+        ]
 
     def __str__(self) -> str:
         return self.text[:NUMBER_OF_LETTERS]
@@ -133,3 +166,79 @@ class Word(models.Model):
 
     def __str__(self) -> str:
         return self.word
+
+
+class Timeline(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timelines',
+        verbose_name='Пост'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ('-pub_date',)
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи лент'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', 'pub_date', 'post'],
+                name='timeline_user_pub_date_idx'
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.user.username}: {self.post}'
+
+
+class UserCounter(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='counter',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков',
+        default=0,
+        db_index=True
+    )
+    following_count = models.PositiveIntegerField('Число подписок', default=0)
+    pulled = models.BooleanField(
+        'Посты читаются при открытии ленты',
+        default=False,
+        db_index=True
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self) -> str:
+        return self.user.username
+
+
+class StoredImage(models.Model):
+    name = models.CharField('Файл', max_length=100, unique=True)
+    references = models.PositiveIntegerField('Число ссылок', default=0)
+
+    class Meta:
+        verbose_name = 'Сохранённое изображение'
+        verbose_name_plural = 'Сохранённые изображения'
+
+    def __str__(self) -> str:
+        return self.name
@@ -0,0 +1,286 @@
+import base64
+import json
+from datetime import datetime
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import EmptyPage, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+DEFAULT_KEYS = ('pub_date', 'id')
+
+COUNT_CACHE_TIMEOUT = 60 * 5
+
+ON_EACH_SIDE = 2
+
+ON_ENDS = 1
+
+# ?before=last — последняя страница, прочитанная с другого конца индекса.
+LAST = 'last'
+
+
+def keyset_ordering(keys, reverse=False):
+    if reverse:
+        return tuple(keys)
+    return tuple(f'-{key}' for key in keys)
+
+
+def page_window(number, last, on_each_side=ON_EACH_SIDE, on_ends=ON_ENDS):
+    """Номера страниц вокруг текущей плюс края; None — пропуск «…»."""
+    if last <= (on_each_side + on_ends) * 2:
+        return list(range(1, last + 1))
+    window = []
+    if number > on_each_side + on_ends + 2:
+        window += list(range(1, on_ends + 1)) + [None]
+        window += list(range(number - on_each_side, number + 1))
+    else:
+        window += list(range(1, number + 1))
+    if number < last - on_each_side - on_ends - 1:
+        window += list(range(number + 1, number + on_each_side + 1)) + [None]
+        window += list(range(last - on_ends + 1, last + 1))
+    else:
+        window += list(range(number + 1, last + 1))
+    return window
+
+
+def keyset_filter(keys, values, reverse=False):
+    """Условие «строго после курсора» для сортировки по убыванию ключей.
+
+    Нестрогое сравнение по первому ключу вынесено отдельно, чтобы база
+    читала диапазон индекса, а не проверяла условие OR на каждой строке.
+    """
+    lookup = 'gt' if reverse else 'lt'
+    condition = Q()
+    for position, key in enumerate(keys):
+        equal = dict(zip(keys[:position], values))
+        condition |= Q(**equal, **{f'{key}__{lookup}': values[position]})
+    return Q(**{f'{keys[0]}__{lookup}e': values[0]}) & condition
+
+
+class KeysetPaginator(Paginator):
+    """Пагинатор с переходом по курсору (pub_date, id) вместо OFFSET.
+
+    Ссылки «вперёд» и «назад» несут непрозрачный курсор с ключом крайней
+    записи, поэтому любая страница читается как диапазон индекса.
+    Соседние номера окна (до ON_EACH_SIDE в каждую сторону) — тоже
+    курсоры: в них записано, сколько страниц пропустить от крайней
+    записи, и OFFSET не больше пары страниц на любой глубине.
+    Последняя страница (?before=last) читается с начала индекса
+    в обратном порядке. Через OFFSET от начала работают только
+    прыжки на дальние номера (?page=N).
+
+    С count_key общее число записей берётся из кэша, а не из COUNT(*)
+    на каждый запрос: оно нужно только для окна номеров страниц.
+    Если число уже известно (например, из счётчика), его передают
+    в known_count.
+    """
+
+    def __init__(self, object_list, per_page, keys=DEFAULT_KEYS,
+                 count_key=None, known_count=None, **kwargs):
+        self.keys = tuple(keys)
+        self.count_key = count_key
+        self.known_count = known_count
+        super().__init__(
+            object_list.order_by(*keyset_ordering(self.keys)),
+            per_page,
+            **kwargs
+        )
+
+    def total(self):
+        return Paginator.count.func(self)
+
+    @cached_property
+    def count(self):
+        if self.known_count is not None:
+            return self.known_count
+        if self.count_key is None:
+            return self.total()
+        return cache.get_or_set(
+            f'paginator_count:{self.count_key}',
+            self.total,
+            COUNT_CACHE_TIMEOUT
+        )
+
+    def refresh_count(self):
+        if self.count_key is not None:
+            cache.delete(f'paginator_count:{self.count_key}')
+        self.__dict__.pop('count', None)
+        self.__dict__.pop('num_pages', None)
+
+    def validate_number(self, number):
+        # Верхнюю границу проверяет сама выборка в page():
+        # кэшированное число записей может отставать от ленты.
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            if int(number) < 1:
+                raise
+            return int(number)
+
+    @property
+    def key_fields(self):
+        opts = self.object_list.model._meta
+        return [opts.get_field(key) for key in self.keys]
+
+    def key_values(self, obj):
+        if isinstance(obj, dict):
+            # Строка values(): ключи словаря — имена столбцов.
+            return [obj[field.attname] for field in self.key_fields]
+        return [getattr(obj, field.attname) for field in self.key_fields]
+
+    def encode_cursor(self, number, obj, skip=0):
+        payload = [number] + [
+            value.isoformat() if isinstance(value, datetime) else value
+            for value in self.key_values(obj)
+        ]
+        if skip:
+            payload.append(skip)
+        token = base64.urlsafe_b64encode(json.dumps(payload).encode())
+        return token.decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padding = '=' * (-len(cursor) % 4)
+            payload = base64.urlsafe_b64decode(cursor + padding)
+            number, *raw = json.loads(payload)
+            # Необязательный хвост — сколько страниц пропустить за курсором.
+            skip = raw.pop() if len(raw) == len(self.keys) + 1 else 0
+            values = [
+                field.to_python(value)
+                for field, value in zip(self.key_fields, raw)
+            ]
+        except (ValueError, TypeError, ValidationError):
+            raise ValueError('Некорректный курсор')
+        if (
+            not isinstance(number, int) or number < 1
+            or len(raw) != len(self.keys) or None in values
+            or not isinstance(skip, int) or not 0 <= skip < ON_EACH_SIDE
+        ):
+            raise ValueError('Некорректный курсор')
+        return number, values, skip
+
+    def fetch(self, values=None, reverse=False, offset=0, limit=None):
+        queryset = self.object_list
+        if values is not None:
+            queryset = queryset.filter(
+                keyset_filter(self.keys, values, reverse)
+            )
+        if reverse:
+            queryset = queryset.reverse()
+        return list(queryset[offset:offset + limit])
+
+    def get_page(self, number=None, after=None, before=None):
+        if before == LAST:
+            return self.last_page()
+        cursor = before or after
+        if cursor:
+            try:
+                number, values, skip = self.decode_cursor(cursor)
+            except ValueError:
+                return self.cursor_page(1)
+            return self.cursor_page(
+                number, values, reverse=bool(before), skip=skip
+            )
+        if number is None:
+            return self.cursor_page(1)
+        return super().get_page(number)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if number > 1 and number == self.num_pages:
+            return self.last_page()
+        rows = self.fetch(
+            offset=(number - 1) * self.per_page,
+            limit=self.per_page + 1
+        )
+        if not rows and number > 1:
+            self.refresh_count()
+            return self.last_page()
+        return self.build_page(
+            rows[:self.per_page],
+            number,
+            has_previous=number > 1,
+            has_next=len(rows) > self.per_page
+        )
+
+    def last_page(self):
+        """Последняя страница без OFFSET: самые старые записи читаются
+        по индексу в обратном порядке и переворачиваются.
+
+        Записей на ней столько же, сколько отдал бы OFFSET при текущем
+        числе записей count.
+        """
+        last = self.num_pages
+        if last <= 1:
+            return self.cursor_page(1)
+        rows = self.fetch(
+            reverse=True, limit=self.count - (last - 1) * self.per_page
+        )
+        if not rows:
+            return self.cursor_page(1)
+        rows.reverse()
+        return self.build_page(rows, last, has_previous=True, has_next=False)
+
+    def cursor_page(self, number, values=None, reverse=False, skip=0):
+        # Лишняя (per_page + 1) строка — признак того, что дальше
+        # есть ещё страница.
+        rows = self.fetch(
+            values,
+            reverse,
+            offset=skip * self.per_page,
+            limit=self.per_page + 1
+        )
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            if not has_more:
+                # Дошли до начала ленты — отдаём первую страницу целиком.
+                return self.cursor_page(1)
+            rows.reverse()
+            return self.build_page(
+                rows, max(number, 2), has_previous=True, has_next=True
+            )
+        if values is not None and not rows:
+            return self.cursor_page(1)
+        return self.build_page(
+            rows, number, has_previous=values is not None, has_next=has_more
+        )
+
+    def build_page(self, rows, number, has_previous, has_next):
+        page = self._get_page(rows, number, self)
+        page.previous_cursor = None
+        page.next_cursor = None
+        # Кэшированное число записей может отставать от ленты.
+        last = max(self.num_pages, number + has_next)
+        page.page_window = page_window(number, last)
+        if has_previous and rows:
+            page.previous_cursor = self.encode_cursor(number - 1, rows[0])
+        if has_next and rows:
+            page.next_cursor = self.encode_cursor(number + 1, rows[-1])
+        page.page_links = [
+            (target, self.page_link(page, target, last))
+            for target in page.page_window
+        ]
+        return page
+
+    def page_link(self, page, target, last):
+        """Строка запроса для номера target из окна страницы page.
+
+        Соседние номера — курсор от крайней записи страницы с пропуском,
+        края — ?page=1 и ?before=last, остальные — ?page=N.
+        """
+        if target is None or target == page.number:
+            return None
+        if target == 1:
+            return 'page=1'
+        if target == last:
+            return f'before={LAST}'
+        shift = target - page.number
+        if 0 < shift <= ON_EACH_SIDE and page.next_cursor:
+            cursor = self.encode_cursor(target, page[-1], skip=shift - 1)
+            return f'after={cursor}'
+        if 0 < -shift <= ON_EACH_SIDE and page.previous_cursor:
+            cursor = self.encode_cursor(target, page[0], skip=-shift - 1)
+            return f'before={cursor}'
+        return f'page={target}'
@@ -0,0 +1,166 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Comment, Post
+
+# Совпадение в комментарии весит вдвое меньше совпадения в самом посте.
+COMMENT_WEIGHT = 0.5
+
+WORD = re.compile(r'\w+')
+
+TOKENIZER = 'unicode61 remove_diacritics 2'
+
+# Таблица FTS5 для каждого индексируемого поля text.
+INDEXES = {
+    Post: 'posts_post_fts',
+    Comment: 'posts_comment_fts',
+}
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def index_statements(model, fts):
+    """DDL таблицы FTS5 с внешним содержимым и синхронизирующих триггеров."""
+    table = model._meta.db_table
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"text, content='{table}', content_rowid='id', "
+        f"tokenize='{TOKENIZER}')",
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} '
+        f'BEGIN INSERT INTO {fts}(rowid, text) VALUES (new.id, new.text); '
+        f'END',
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} '
+        f"BEGIN INSERT INTO {fts}({fts}, rowid, text) "
+        f"VALUES ('delete', old.id, old.text); END",
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF text '
+        f'ON {table} '
+        f"BEGIN INSERT INTO {fts}({fts}, rowid, text) "
+        f"VALUES ('delete', old.id, old.text); "
+        f'INSERT INTO {fts}(rowid, text) VALUES (new.id, new.text); END',
+    ]
+
+
+def rebuild():
+    """Создаёт недостающие таблицы и триггеры и переиндексирует тексты.
+
+    Нужна после пересоздания таблицы постов или комментариев
+    миграцией: SQLite удаляет триггеры вместе со старой таблицей.
+    """
+    with connection.cursor() as cursor:
+        for model, fts in INDEXES.items():
+            for statement in index_statements(model, fts):
+                cursor.execute(statement)
+            cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def build_query(text):
+    """Строка запроса FTS5: все слова, каждое как префикс.
+
+    Слова берутся в кавычки, поэтому операторы FTS5 во вводе
+    пользователя не работают и не ломают запрос.
+    """
+    return ' '.join(f'"{word}"*' for word in WORD.findall(text.lower()))
+
+
+def matching(model, text):
+    """Условие «текст записи подходит под запрос» для фильтра queryset."""
+    query = build_query(text)
+    if not query:
+        return Q(pk__in=[])
+    if not is_available():
+        return Q(text__icontains=text)
+    fts = INDEXES[model]
+    return Q(pk__in=RawSQL(
+        f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s', [query]
+    ))
+
+
+class PostSearch:
+    """Посты по запросу, от самых подходящих: по тексту и комментариям.
+
+    Ведёт себя как список для Paginator: count() и срезы выполняют
+    запросы к индексу FTS5 и читают только нужную страницу.
+    """
+
+    def __init__(self, text, group=None, author=None):
+        self.query = build_query(text)
+        self.text = text
+        self.group = group
+        self.author = author
+
+    def ranked_sql(self):
+        post_fts = INDEXES[Post]
+        comment_fts = INDEXES[Comment]
+        conditions = []
+        params = [self.query, COMMENT_WEIGHT, self.query]
+        if self.group is not None:
+            conditions.append('post.group_id = %s')
+            params.append(self.group.pk)
+        if self.author is not None:
+            conditions.append('post.author_id = %s')
+            params.append(self.author.pk)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        sql = (
+            'SELECT found.post_id, MIN(found.score) AS score FROM ('
+            f'SELECT rowid AS post_id, bm25({post_fts}) AS score '
+            f'FROM {post_fts} WHERE {post_fts} MATCH %s '
+            'UNION ALL '
+            f'SELECT comment.post_id, bm25({comment_fts}) * %s '
+            f'FROM {comment_fts} '
+            f'JOIN {Comment._meta.db_table} comment '
+            f'ON comment.id = {comment_fts}.rowid '
+            f'WHERE {comment_fts} MATCH %s'
+            ') found '
+            f'JOIN {Post._meta.db_table} post ON post.id = found.post_id '
+            f'{where} GROUP BY found.post_id'
+        )
+        return sql, params
+
+    def fallback(self):
+        posts = Post.objects.filter(
+            Q(text__icontains=self.text)
+            | Q(comments__text__icontains=self.text)
+        )
+        if self.group is not None:
+            posts = posts.filter(group=self.group)
+        if self.author is not None:
+            posts = posts.filter(author=self.author)
+        return posts.distinct().order_by('-pub_date', '-pk')
+
+    def count(self):
+        if not self.query:
+            return 0
+        if not is_available():
+            return self.fallback().count()
+        sql, params = self.ranked_sql()
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM ({sql})', params)
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        if not self.query:
+            return []
+        if not is_available():
+            return list(
+                self.fallback().select_related('author', 'group')[index]
+            )
+        sql, params = self.ranked_sql()
+        limit = index.stop - index.start
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'{sql} ORDER BY score, found.post_id DESC LIMIT %s OFFSET %s',
+                params + [limit, index.start]
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        posts = Post.objects.select_related('author', 'group').in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
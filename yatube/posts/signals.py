@@ -0,0 +1,133 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import cards, feeds, thumbnails, words
+from .counters import (acquire_image, bump, bump_group, bump_user,
+                       release_image)
+from .freshness import bump_comments, bump_follows
+from .models import Comment, Follow, Group, Post, UserCounter, Word
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+def create_user_counter(sender, instance, created, **kwargs):
+    if created:
+        UserCounter.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def remember_saved_post(sender, instance, **kwargs):
+    instance._saved_group_id = None
+    instance._saved_image = ''
+    if instance.pk:
+        saved = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('group_id', 'image').first()
+        if saved is not None:
+            instance._saved_group_id, instance._saved_image = saved
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, **kwargs):
+    if created:
+        bump_user(instance.author_id, 'posts_count', 1)
+        bump_group(instance.group_id, 1)
+    elif instance._saved_group_id != instance.group_id:
+        bump_group(instance._saved_group_id, -1)
+        bump_group(instance.group_id, 1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    bump_user(instance.author_id, 'posts_count', -1)
+    bump_group(instance.group_id, -1)
+
+
+def drop_image(name):
+    if release_image(name):
+        thumbnails.discard(name)
+
+
+@receiver(post_save, sender=Post)
+def count_post_image(sender, instance, **kwargs):
+    if instance._saved_image != instance.image.name:
+        acquire_image(instance.image.name)
+        drop_image(instance._saved_image)
+
+
+@receiver(post_delete, sender=Post)
+def release_post_image(sender, instance, **kwargs):
+    drop_image(instance.image.name)
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, **kwargs):
+    if created:
+        bump(Post.objects.filter(pk=instance.post_id), 'comments_count', 1)
+    bump_comments(instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    bump(Post.objects.filter(pk=instance.post_id), 'comments_count', -1)
+    bump_comments(instance.post_id)
+
+
+@receiver(post_save, sender=Post)
+def push_post_to_timelines(sender, instance, created, **kwargs):
+    if created:
+        feeds.fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if created:
+        bump_user(instance.author_id, 'followers_count', 1)
+        bump_user(instance.user_id, 'following_count', 1)
+        feeds.start_pulling(
+            UserCounter.objects.filter(user_id=instance.author_id)
+        )
+        feeds.backfill(instance.user_id, instance.author_id)
+        bump_follows(instance.user_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    bump_user(instance.author_id, 'followers_count', -1)
+    bump_user(instance.user_id, 'following_count', -1)
+    # Автор, опустившийся ниже порога, остаётся подмешиваемым: его посты
+    # возвращает в ленты reconcile_counters, а не запрос на отписку.
+    feeds.prune(instance.user_id, instance.author_id)
+    bump_follows(instance.user_id)
+
+
+@receiver(post_save, sender=Word)
+@receiver(post_delete, sender=Word)
+def word_changed(sender, **kwargs):
+    words.invalidate()
+
+
+@receiver(post_save, sender=Post)
+def post_card_changed(sender, instance, **kwargs):
+    cards.invalidate(f'post:{instance.pk}', cards.INDEX_VERSION)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted_from_feeds(sender, instance, **kwargs):
+    cards.invalidate(f'post:{instance.pk}', cards.INDEX_VERSION)
+
+
+@receiver(post_save, sender=User)
+def author_card_changed(sender, instance, update_fields=None, **kwargs):
+    # Вход пользователя сохраняет только last_login — карточки не меняются.
+    if update_fields is None or set(update_fields) != {'last_login'}:
+        cards.invalidate(f'user:{instance.pk}', cards.INDEX_VERSION)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_card_changed(sender, instance, **kwargs):
+    # Удаление группы обнуляет group у постов одним UPDATE без post_save.
+    cards.invalidate(f'group:{instance.pk}', cards.INDEX_VERSION)
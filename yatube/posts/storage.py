@@ -0,0 +1,50 @@
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+DEFAULT_PERMISSIONS = 0o644
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, где имя файла — SHA-256 его содержимого.
+
+    Загрузка пишется во временный файл и одновременно хешируется, затем
+    переносится в <каталог>/ab/cd/<хеш>.<расширение>. Если такое
+    содержимое уже есть, новый файл не создаётся: повторные загрузки
+    ссылаются на тот же файл и на те же миниатюры.
+    """
+
+    def content_name(self, name, digest):
+        directory = posixpath.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return posixpath.join(
+            directory, digest[:2], digest[2:4], digest + extension
+        )
+
+    def _save(self, name, content):
+        os.makedirs(self.location, exist_ok=True)
+        digest = hashlib.sha256()
+        with tempfile.NamedTemporaryFile(
+            dir=self.location, prefix='.upload-', delete=False
+        ) as temp:
+            try:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    temp.write(chunk)
+            except BaseException:
+                os.remove(temp.name)
+                raise
+        name = self.content_name(name, digest.hexdigest())
+        path = self.path(name)
+        if os.path.exists(path):
+            os.remove(temp.name)
+            return name
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(temp.name, path)
+        os.chmod(path, self.file_permissions_mode or DEFAULT_PERMISSIONS)
+        return name
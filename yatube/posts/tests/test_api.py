@@ -0,0 +1,189 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+from ..views import COMMENTS_NUMBER, PAGINATOR_NUMBER
+
+User = get_user_model()
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание'
+        )
+        for number in range(PAGINATOR_NUMBER + 3):
+            Post.objects.create(
+                author=cls.author,
+                group=cls.group,
+                text=f'Пост {number}'
+            )
+        cls.post = Post.objects.latest('pub_date', 'id')
+        for number in range(COMMENTS_NUMBER + 1):
+            Comment.objects.create(
+                post=cls.post,
+                author=cls.reader,
+                text=f'Комментарий {number}'
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(ApiTests.reader)
+
+    def get(self, name, params=None, **kwargs):
+        response = self.reader_client.get(
+            reverse(name, kwargs=kwargs), params
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        return response.json()
+
+    def test_feeds_match_html_order_and_cursor(self):
+        """Ленты API идут в порядке HTML-лент и листаются курсором."""
+        expected = list(
+            Post.objects.order_by('-pub_date', '-id').values_list(
+                'pk', flat=True
+            )
+        )
+        feeds = (
+            ('posts:api_index', {}),
+            ('posts:api_group_list', {'slug': self.group.slug}),
+            ('posts:api_profile', {'username': self.author.username}),
+        )
+        for name, kwargs in feeds:
+            with self.subTest(name=name):
+                first = self.get(name, **kwargs)
+                second = self.get(name, {'after': first['next']}, **kwargs)
+                self.assertEqual(first['count'], len(expected))
+                self.assertIsNone(first['previous'])
+                self.assertIsNone(second['next'])
+                self.assertEqual(
+                    [post['id'] for post in first['results']]
+                    + [post['id'] for post in second['results']],
+                    expected
+                )
+
+    def test_sparse_fields(self):
+        """?fields= оставляет только перечисленные поля."""
+        data = self.get('posts:api_index', {'fields': 'author,id'})
+        self.assertEqual(
+            data['results'][0],
+            {'id': self.post.pk, 'author': self.author.username}
+        )
+        data = self.get('posts:api_index')
+        self.assertEqual(data['results'][0]['group'], self.group.slug)
+        self.assertIsNone(data['results'][0]['image'])
+
+    def test_unknown_field_is_rejected(self):
+        response = self.reader_client.get(
+            reverse('posts:api_index'), {'fields': 'id,password'}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', response.json()['detail'])
+
+    def test_post_detail_and_comments(self):
+        """Пост и его комментарии отдаются с курсором по комментариям."""
+        post = self.get(
+            'posts:api_post_detail',
+            {'fields': 'text,comments_count'},
+            post_id=self.post.pk
+        )
+        self.assertEqual(
+            post,
+            {'text': self.post.text, 'comments_count': COMMENTS_NUMBER + 1}
+        )
+        first = self.get('posts:api_post_comments', post_id=self.post.pk)
+        second = self.get(
+            'posts:api_post_comments',
+            {'after': first['next']},
+            post_id=self.post.pk
+        )
+        self.assertEqual(len(first['results']), COMMENTS_NUMBER)
+        self.assertEqual(
+            second['results'][0]['text'], 'Комментарий 0'
+        )
+        self.assertEqual(second['results'][0]['author'], 'reader')
+
+    def test_missing_objects(self):
+        urls = (
+            reverse('posts:api_group_list', kwargs={'slug': 'missing'}),
+            reverse('posts:api_profile', kwargs={'username': 'missing'}),
+            reverse('posts:api_post_detail', kwargs={'post_id': 0}),
+            reverse('posts:api_post_comments', kwargs={'post_id': 0}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.reader_client.get(url).status_code, 404)
+
+    def test_api_is_read_only(self):
+        response = self.reader_client.post(reverse('posts:api_index'))
+        self.assertEqual(response.status_code, 405)
+
+    def test_conditional_requests(self):
+        """Неизменившийся ответ API отдаётся как 304."""
+        url = reverse('posts:api_index')
+        etag = self.reader_client.get(url)['ETag']
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Post.objects.create(author=self.author, text='Новый')
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(FEED_FANOUT_LIMIT=1)
+class ApiFollowTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.celebrity = User.objects.create_user(username='celebrity')
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        fan = User.objects.create_user(username='fan')
+        Follow.objects.create(user=fan, author=cls.celebrity)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(ApiFollowTests.reader)
+
+    def test_follow_feed_requires_login(self):
+        response = Client().get(reverse('posts:api_follow_index'))
+        self.assertEqual(response.status_code, 401)
+
+    def test_follow_feed_merges_pushed_and_pulled_posts(self):
+        """Лента подписок API совпадает с HTML-лентой."""
+        Follow.objects.create(user=self.reader, author=self.celebrity)
+        Follow.objects.create(user=self.reader, author=self.author)
+        for number in range(PAGINATOR_NUMBER + 2):
+            Post.objects.create(
+                author=(self.celebrity, self.author)[number % 2],
+                text=f'Пост {number}'
+            )
+        expected = list(
+            Post.objects.order_by('-pub_date', '-id').values_list(
+                'pk', 'text'
+            )
+        )
+        first = self.reader_client.get(
+            reverse('posts:api_follow_index'), {'fields': 'id,text'}
+        ).json()
+        second = self.reader_client.get(
+            reverse('posts:api_follow_index'),
+            {'fields': 'id,text', 'after': first['next']}
+        ).json()
+        self.assertEqual(
+            [
+                (post['id'], post['text'])
+                for post in first['results'] + second['results']
+            ],
+            expected
+        )
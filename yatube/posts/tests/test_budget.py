@@ -0,0 +1,141 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.budget import QueryBudgetMixin
+
+from .. import bench, urls
+from ..models import Follow, Group, Post
+
+User = get_user_model()
+
+# Бюджет запросов к базе на холодный ответ каждого представления
+# posts. Новый запрос на странице — повод поднять число здесь
+# и объяснить это в ревью; запрос на каждую запись сюда не поместится.
+# Штампы версий (core.versions) читаются из базы: один запрос на
+# валидаторы ETag, один на карточки страницы, один на фрагмент главной.
+BUDGETS = {
+    'posts:index': 5,
+    'posts:group_list': 4,
+    'posts:follow_index': 6,
+    'posts:profile_follow': 16,
+    'posts:profile_unfollow': 11,
+    'posts:profile_export': 6,
+    'posts:profile': 7,
+    'posts:add_comment': 10,
+    'posts:post_comments': 2,
+    'posts:post_edit': 8,
+    'posts:post_detail': 6,
+    'posts:search': 5,
+    'posts:post_create': 13,
+    'posts:api_index': 2,
+    'posts:api_group_list': 3,
+    'posts:api_profile': 3,
+    'posts:api_follow_index': 5,
+    'posts:api_post_detail': 3,
+    'posts:api_post_comments': 4,
+}
+
+POSTS = 600
+
+USERS = 120
+
+
+class PostQueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        dataset = bench.Dataset(POSTS)
+        dataset.users = USERS
+        dataset.create()
+        cls.group = Group.objects.order_by('-posts_count').first()
+        cls.author = User.objects.order_by('-counter__posts_count').first()
+        cls.post = Post.objects.filter(author=cls.author).order_by(
+            '-comments_count'
+        ).first()
+        cls.reader = User.objects.order_by(
+            '-counter__following_count'
+        ).first()
+        cls.followed = Follow.objects.filter(user=cls.reader).first().author
+        cls.stranger = User.objects.exclude(
+            following__user=cls.reader
+        ).exclude(pk=cls.reader.pk).first()
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.author_client = Client()
+        self.author_client.force_login(PostQueryBudgetTests.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(PostQueryBudgetTests.reader)
+
+    def get_cases(self):
+        """Запросы к представлениям: имя, клиент, метод, адрес, данные
+        и ожидаемый код ответа.
+        """
+        post = {'post_id': self.post.pk}
+        author = {'username': self.author.username}
+        group = {'slug': self.group.slug}
+        return [
+            ('posts:index', self.guest_client, 'get',
+             reverse('posts:index'), None, 200),
+            ('posts:group_list', self.guest_client, 'get',
+             reverse('posts:group_list', kwargs=group), None, 200),
+            ('posts:follow_index', self.reader_client, 'get',
+             reverse('posts:follow_index'), None, 200),
+            ('posts:profile_follow', self.reader_client, 'get',
+             reverse(
+                 'posts:profile_follow',
+                 kwargs={'username': self.stranger.username}
+             ), None, 302),
+            ('posts:profile_unfollow', self.reader_client, 'get',
+             reverse(
+                 'posts:profile_unfollow',
+                 kwargs={'username': self.followed.username}
+             ), None, 302),
+            ('posts:profile_export', self.author_client, 'get',
+             reverse('posts:profile_export', kwargs=author), None, 200),
+            ('posts:profile', self.reader_client, 'get',
+             reverse('posts:profile', kwargs=author), None, 200),
+            ('posts:add_comment', self.reader_client, 'post',
+             reverse('posts:add_comment', kwargs=post),
+             {'text': 'Новый комментарий'}, 302),
+            ('posts:post_comments', self.guest_client, 'get',
+             reverse('posts:post_comments', kwargs=post), None, 200),
+            ('posts:post_edit', self.author_client, 'get',
+             reverse('posts:post_edit', kwargs=post), None, 200),
+            ('posts:post_detail', self.reader_client, 'get',
+             reverse('posts:post_detail', kwargs=post), None, 200),
+            ('posts:search', self.guest_client, 'get',
+             reverse('posts:search'), {'q': 'день'}, 200),
+            ('posts:post_create', self.author_client, 'post',
+             reverse('posts:post_create'),
+             {'text': 'Новый пост', 'group': self.group.pk}, 302),
+            ('posts:api_index', self.guest_client, 'get',
+             reverse('posts:api_index'), None, 200),
+            ('posts:api_group_list', self.guest_client, 'get',
+             reverse('posts:api_group_list', kwargs=group), None, 200),
+            ('posts:api_profile', self.guest_client, 'get',
+             reverse('posts:api_profile', kwargs=author), None, 200),
+            ('posts:api_follow_index', self.reader_client, 'get',
+             reverse('posts:api_follow_index'), None, 200),
+            ('posts:api_post_detail', self.guest_client, 'get',
+             reverse('posts:api_post_detail', kwargs=post), None, 200),
+            ('posts:api_post_comments', self.guest_client, 'get',
+             reverse('posts:api_post_comments', kwargs=post), None, 200),
+        ]
+
+    def test_every_view_has_budget(self):
+        """У каждого адреса posts есть бюджет и проверка."""
+        names = {f'{urls.app_name}:{url.name}' for url in urls.urlpatterns}
+        self.assertEqual(set(BUDGETS), names)
+        self.assertEqual({case[0] for case in self.get_cases()}, names)
+
+    def test_views_stay_within_budget(self):
+        """Представления укладываются в бюджет запросов и времени."""
+        for name, client, method, url, data, status in self.get_cases():
+            with self.subTest(name=name):
+                self.assertQueryBudget(
+                    BUDGETS[name], client, url, method, status, data=data
+                )
@@ -0,0 +1,227 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from .. import bench
+
+from ..models import Comment, Follow, Group, Post, Timeline, UserCounter
+
+User = get_user_model()
+
+NUMBER_OF_POSTS = 15
+
+
+class ExplainViewsCommandTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for number in range(NUMBER_OF_POSTS):
+            post = Post.objects.create(
+                author=cls.author,
+                group=cls.group,
+                text=f'Тестовый пост {number}'
+            )
+        Comment.objects.create(
+            post=post,
+            author=cls.reader,
+            text='Тестовый комментарий'
+        )
+
+    def test_views_use_indexes(self):
+        """Запросы представлений posts читают данные по индексам."""
+        out = StringIO()
+        call_command('explain_views', stdout=out, verbosity=2)
+        output = out.getvalue()
+        self.assertIn('Все планы используют индексы.', output)
+        for name in (
+            'index', 'group_list', 'profile', 'post_detail', 'post_comments',
+            'follow_index', 'search', 'api_index', 'api_group_list',
+            'api_profile', 'api_follow_index', 'api_post_detail',
+            'api_post_comments',
+        ):
+            with self.subTest(name=name):
+                self.assertIn(f'posts:{name}: SELECT', output)
+
+
+class ReconcileCountersCommandTests(TestCase):
+    def test_reconcile_repairs_drift(self):
+        """Команда reconcile_counters чинит разошедшиеся счётчики."""
+        author = User.objects.create_user(username='author')
+        group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание'
+        )
+        Post.objects.bulk_create([
+            Post(author=author, group=group, text='Тестовый пост')
+            for _ in range(3)
+        ])
+        UserCounter.objects.filter(user=author).delete()
+        call_command('reconcile_counters', stdout=StringIO())
+        group.refresh_from_db()
+        self.assertEqual(group.posts_count, 3)
+        self.assertEqual(
+            UserCounter.objects.get(user=author).posts_count,
+            3
+        )
+
+
+class ImportCommandTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def write_jsonl(self, name, records):
+        return self.write(
+            name, ''.join(json.dumps(record) + '\n' for record in records)
+        )
+
+    def load(self, kind, path, **options):
+        options.setdefault('batch_size', 2)
+        call_command(
+            'import_yatube',
+            kind,
+            path,
+            stdout=StringIO(),
+            stderr=StringIO(),
+            **options
+        )
+
+    def test_import_community(self):
+        """Выгруз загружается пачками с исходными датами, а ленты
+        и счётчики пересобираются.
+        """
+        self.load('users', self.write(
+            'users.csv', 'username,email\nauthor,a@example.com\nreader,\n'
+        ))
+        self.load('groups', self.write_jsonl('groups.jsonl', [
+            {'title': 'Группа', 'slug': 'group', 'description': 'Описание'}
+        ]))
+        self.load('posts', self.write_jsonl('posts.jsonl', [
+            {
+                'id': 100 + number,
+                'author': 'author',
+                'group': 'group',
+                'text': f'Перенесённый пост {number}',
+                'pub_date': f'2015-01-0{number + 1}T10:00:00+00:00'
+            }
+            for number in range(3)
+        ] + [{'author': 'ghost', 'text': 'Пост без автора'}]))
+        self.load('comments', self.write_jsonl('comments.jsonl', [
+            {
+                'post': 100,
+                'author': 'reader',
+                'text': 'Старый комментарий',
+                'created': '2015-02-01T10:00:00'
+            }
+        ]))
+        self.load('follows', self.write(
+            'follows.csv', 'user,author\nreader,author\nreader,reader\n'
+        ))
+        post = Post.objects.get(pk=100)
+        self.assertEqual(
+            post.pub_date, datetime(2015, 1, 1, 10, tzinfo=timezone.utc)
+        )
+        self.assertEqual(post.group.slug, 'group')
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(
+            Comment.objects.get().created,
+            datetime(2015, 2, 1, 10, tzinfo=timezone.utc)
+        )
+        self.assertEqual(Post.objects.count(), 3)
+        self.assertEqual(Group.objects.get().posts_count, 3)
+        counter = UserCounter.objects.get(user__username='author')
+        self.assertEqual(counter.posts_count, 3)
+        self.assertEqual(counter.followers_count, 1)
+        self.assertEqual(
+            Timeline.objects.filter(user__username='reader').count(), 3
+        )
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertTrue(
+            Post._meta.get_field('pub_date').auto_now_add,
+            'auto_now_add должен вернуться после загрузки'
+        )
+
+    def test_import_large_batches(self):
+        """Пачка больше предела составного SELECT в SQLite (500 строк)
+        загружается целиком.
+        """
+        self.load('users', self.write(
+            'users.csv', 'username\n' + ''.join(
+                f'user{number}\n' for number in range(600)
+            )
+        ), batch_size=1000)
+        self.load('follows', self.write(
+            'follows.csv', 'user,author\n' + ''.join(
+                f'user{number},user0\n' for number in range(1, 600)
+            )
+        ), batch_size=1000)
+        self.assertEqual(User.objects.count(), 600)
+        self.assertEqual(Follow.objects.count(), 599)
+
+    def test_broken_file_stops_import(self):
+        path = self.write('broken.jsonl', '{"title": "Группа", \n')
+        with self.assertRaises(CommandError):
+            self.load('groups', path)
+
+
+class BenchTests(TestCase):
+    def posts(self):
+        return list(Post.objects.order_by('pk').values_list(
+            'text', 'author__username'
+        ))
+
+    def test_dataset_is_deterministic(self):
+        """Набор одного размера и зерна всегда одинаков."""
+        bench.Dataset(200).create()
+        texts = self.posts()
+        self.assertEqual(len(texts), 200)
+        self.assertEqual(
+            UserCounter.objects.get(user__username='user0').posts_count,
+            Post.objects.filter(author__username='user0').count()
+        )
+        Post.objects.all().delete()
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        bench.Dataset(200).create()
+        self.assertEqual(self.posts(), texts)
+
+    def test_run_reports_every_view(self):
+        bench.Dataset(200).create()
+        results = bench.run(requests=3)
+        self.assertIn('posts:index', results)
+        for name, metrics in results.items():
+            with self.subTest(name=name):
+                self.assertGreater(metrics['queries'], 0)
+                self.assertGreater(metrics['bytes'], 0)
+                self.assertLessEqual(metrics['p50_ms'], metrics['p99_ms'])
+
+    def test_parse_size(self):
+        self.assertEqual(bench.parse_size('1m'), 1_000_000)
+        self.assertEqual(bench.parse_size('25k'), 25_000)
+        self.assertEqual(bench.parse_size('300'), 300)
+        with self.assertRaises(ValueError):
+            bench.parse_size('много')
@@ -0,0 +1,182 @@
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Follow, Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ExportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(
+            author=cls.author,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile(
+                name='small.gif',
+                content=SMALL_GIF,
+                content_type='image/gif'
+            )
+        )
+        Post.objects.create(author=cls.reader, text='Чужой пост')
+        Comment.objects.create(
+            post=cls.post, author=cls.author, text='Свой комментарий'
+        )
+        Follow.objects.create(user=cls.author, author=cls.reader)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.author_client = Client()
+        self.author_client.force_login(ExportTests.author)
+        self.url = reverse(
+            'posts:profile_export', kwargs={'username': 'auth'}
+        )
+
+    def download(self, params=None):
+        response = self.author_client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_jsonl_export(self):
+        """В выгрузке только записи пользователя, по строке на запись."""
+        response, content = self.download()
+        self.assertIn('auth-export.jsonl', response['Content-Disposition'])
+        rows = [json.loads(line) for line in content.decode().splitlines()]
+        self.assertEqual(
+            [(row['kind'], row.get('text')) for row in rows],
+            [
+                ('posts', 'Пост с картинкой'),
+                ('comments', 'Свой комментарий'),
+                ('follows', None),
+            ]
+        )
+        self.assertEqual(rows[2]['author'], 'reader')
+
+    def test_csv_export(self):
+        _, content = self.download({'format': 'csv'})
+        rows = list(csv.DictReader(io.StringIO(content.decode())))
+        self.assertEqual(
+            [row['kind'] for row in rows], ['posts', 'comments', 'follows']
+        )
+        self.assertEqual(rows[0]['image'], self.post.image.name)
+
+    def test_zip_export_with_images(self):
+        """Архив содержит файл на каждый вид записей и картинки."""
+        response, content = self.download({'zip': 1, 'images': 1})
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            self.assertEqual(
+                sorted(archive.namelist()),
+                [
+                    'comments.jsonl',
+                    'follows.jsonl',
+                    f'images/{self.post.image.name}',
+                    'posts.jsonl',
+                ]
+            )
+            self.assertEqual(
+                archive.read(f'images/{self.post.image.name}'), SMALL_GIF
+            )
+            post = json.loads(archive.read('posts.jsonl'))
+            self.assertEqual(post['id'], self.post.pk)
+            self.assertNotIn('kind', post)
+
+    def test_export_is_private(self):
+        """Чужую выгрузку получить нельзя."""
+        reader_client = Client()
+        reader_client.force_login(ExportTests.reader)
+        self.assertEqual(reader_client.get(self.url).status_code, 403)
+        response = Client().get(self.url)
+        self.assertEqual(response.status_code, 302)
+
+    def test_export_command(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, 'export.zip')
+        call_command(
+            'export_yatube',
+            'auth',
+            format='csv',
+            zip=True,
+            output=path,
+            stdout=io.StringIO()
+        )
+        with zipfile.ZipFile(path) as archive:
+            comments = archive.read('comments.csv').decode().splitlines()
+        self.assertEqual(comments[0], 'id,post,author,text,created')
+        self.assertEqual(len(comments), 2)
+
+    def snapshot(self):
+        return (
+            list(Post.objects.filter(author=self.author).values_list(
+                'pk', 'text', 'pub_date', 'image'
+            )),
+            list(Comment.objects.values_list(
+                'pk', 'post_id', 'author__username', 'text', 'created'
+            )),
+            list(Follow.objects.values_list(
+                'user__username', 'author__username'
+            )),
+        )
+
+    def test_export_round_trip(self):
+        """Общий файл выгрузки загружается обратно через import_yatube."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        expected = self.snapshot()
+        for data_format in ('jsonl', 'csv'):
+            with self.subTest(data_format=data_format):
+                path = os.path.join(directory, f'export.{data_format}')
+                call_command(
+                    'export_yatube',
+                    'auth',
+                    format=data_format,
+                    output=path,
+                    stdout=io.StringIO()
+                )
+                Post.objects.filter(author=self.author).delete()
+                Follow.objects.filter(user=self.author).delete()
+                stderr = io.StringIO()
+                call_command(
+                    'import_yatube',
+                    'all',
+                    path,
+                    stdout=io.StringIO(),
+                    stderr=stderr
+                )
+                self.assertEqual(stderr.getvalue(), '')
+                self.assertEqual(self.snapshot(), expected)
+                post = Post.objects.get(pk=self.post.pk)
+                self.assertEqual(post.comments_count, 1)
@@ -0,0 +1,200 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import Q
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Follow, Post, Timeline, UserCounter
+from ..views import PAGINATOR_NUMBER
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.author, text='Старый пост')
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(TimelineTests.reader)
+        self.author_client = Client()
+        self.author_client.force_login(TimelineTests.author)
+
+    def follow(self):
+        self.reader_client.get(reverse(
+            'posts:profile_follow',
+            kwargs={'username': self.author.username}
+        ))
+
+    def test_follow_backfills_timeline(self):
+        """Подписка добавляет в ленту уже опубликованные посты автора."""
+        self.follow()
+        self.assertTrue(
+            Timeline.objects.filter(user=self.reader, post=self.post).exists()
+        )
+
+    def test_new_post_is_pushed_to_followers(self):
+        """Новый пост попадает в ленты подписчиков при публикации."""
+        self.follow()
+        self.author_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Новый пост'}
+        )
+        new_post = Post.objects.get(text='Новый пост')
+        self.assertTrue(
+            Timeline.objects.filter(user=self.reader, post=new_post).exists()
+        )
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'][0], new_post)
+
+    def test_unfollow_prunes_timeline(self):
+        """Отписка убирает посты автора из ленты."""
+        self.follow()
+        self.reader_client.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.author.username}
+        ))
+        self.assertFalse(Timeline.objects.filter(user=self.reader).exists())
+
+    def test_rebuild_timelines_command(self):
+        """Команда rebuild_timelines восстанавливает ленты по подпискам."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Timeline.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(
+            list(self.reader.timeline.values_list('post', flat=True)),
+            [self.post.pk]
+        )
+
+
+@override_settings(FEED_FANOUT_LIMIT=0)
+class HybridFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.celebrity = User.objects.create_user(username='celebrity')
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=cls.reader, author=cls.celebrity)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(HybridFeedTests.reader)
+
+    def test_celebrity_posts_are_not_pushed(self):
+        """Посты автора с подписчиками сверх порога не раскладываются
+        по лентам, но видны в ленте подписчика.
+        """
+        post = Post.objects.create(author=self.celebrity, text='Пост')
+        self.assertFalse(Timeline.objects.filter(post=post).exists())
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), [post])
+
+    def test_pushed_and_pulled_posts_are_merged_by_date(self):
+        """Разложенные и подмешанные посты сливаются в одну ленту
+        по дате публикации страницами по PAGINATOR_NUMBER.
+        """
+        pushed = Post.objects.create(author=self.author, text='Разложен')
+        Timeline.objects.create(
+            user=self.reader,
+            post=pushed,
+            pub_date=pushed.pub_date
+        )
+        for number in range(PAGINATOR_NUMBER):
+            Post.objects.create(author=self.celebrity, text=f'Пост {number}')
+        expected = list(
+            Post.objects.filter(
+                Q(author=self.celebrity) | Q(timelines__user=self.reader)
+            ).order_by('-pub_date', '-id')
+        )
+        first_page = self.reader_client.get(
+            reverse('posts:follow_index')
+        ).context['page_obj']
+        second_page = self.reader_client.get(
+            reverse('posts:follow_index'), {'after': first_page.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(len(first_page), PAGINATOR_NUMBER)
+        self.assertEqual([*first_page, *second_page], expected)
+
+
+@override_settings(FEED_FANOUT_LIMIT=10)
+class FanOutLimitTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.readers = [
+            User.objects.create_user(username=f'reader{number}')
+            for number in range(11)
+        ]
+        for reader in cls.readers:
+            Follow.objects.create(user=reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def is_pulled(self):
+        return UserCounter.objects.get(user=self.author).pulled
+
+    def test_author_over_limit_is_pulled(self):
+        """Автор с подписчиками сверх порога читается при открытии ленты."""
+        self.assertTrue(self.is_pulled())
+        post = Post.objects.create(author=self.author, text='Пост')
+        self.assertFalse(Timeline.objects.filter(post=post).exists())
+
+    def test_author_below_limit_is_pushed_again(self):
+        """Опустившись ниже порога, автор возвращается в ленты подписчиков
+        вместе с постами, опубликованными, пока он читался при открытии.
+        Посты переносит reconcile_counters, а не запрос на отписку.
+        """
+        post = Post.objects.create(author=self.author, text='Пост')
+        Follow.objects.filter(user=self.readers[0]).delete()
+        call_command('reconcile_counters', stdout=StringIO())
+        # Порог с запасом: у самой границы автор не переключается.
+        self.assertTrue(self.is_pulled())
+        Follow.objects.filter(user=self.readers[1]).delete()
+        self.assertTrue(self.is_pulled())
+        reader = self.readers[-1]
+        self.assertFalse(Timeline.objects.filter(user=reader).exists())
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertFalse(self.is_pulled())
+        self.assertTrue(
+            Timeline.objects.filter(user=reader, post=post).exists()
+        )
+        client = Client()
+        client.force_login(reader)
+        response = client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), [post])
+
+    def test_feed_count_across_limit(self):
+        """Число записей и страниц ленты не меняется, когда автор
+        переходит порог: разложенные посты не считаются второй раз.
+        """
+        writer = User.objects.create_user(username='writer')
+        for number in range(PAGINATOR_NUMBER * 3):
+            Post.objects.create(author=writer, text=f'Пост {number}')
+        for reader in self.readers[:10]:
+            Follow.objects.create(user=reader, author=writer)
+        client = Client()
+        client.force_login(self.readers[0])
+
+        def feed():
+            cache.clear()
+            paginator = client.get(
+                reverse('posts:follow_index')
+            ).context['page_obj'].paginator
+            return paginator.count, paginator.num_pages
+
+        self.assertEqual(feed(), (PAGINATOR_NUMBER * 3, 3))
+        Follow.objects.create(user=self.readers[10], author=writer)
+        self.assertTrue(UserCounter.objects.get(user=writer).pulled)
+        self.assertFalse(Timeline.objects.filter(post__author=writer).exists())
+        self.assertEqual(feed(), (PAGINATOR_NUMBER * 3, 3))
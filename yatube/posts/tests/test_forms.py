@@ -1,5 +1,8 @@
+import hashlib
 import shutil
 import tempfile
+import time
+from unittest import mock
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
@@ -7,14 +10,19 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
+from core.models import Version
+
+from .. import words
+from ..forms import CommentForm
 from ..models import Group, Post, Word
+from ..words import WordMatcher
 
 User = get_user_model()
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
 class PostFormTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -218,12 +226,13 @@ class PostFormTests(TestCase):
             reverse('posts:profile', kwargs={'username': 'auth'})
         )
         self.assertEqual(Post.objects.count(), posts_count + 1)
+        digest = hashlib.sha256(small_gif).hexdigest()
         self.assertTrue(
             Post.objects.filter(
                 text=form_data['text'],
                 group=form_data['group'],
                 author=self.post.author,
-                image='posts/small.gif'
+                image=f'posts/{digest[:2]}/{digest[2:4]}/{digest}.gif'
             ).exists()
         )
 
@@ -274,3 +283,51 @@ class PostFormTests(TestCase):
         redirect_link = f'/posts/1/?text={form_data["text"]}'
         self.assertRedirects(response, redirect_link)
         self.assertEqual(self.post.comments.count(), comments_count)
+
+
+class WordMatcherTests(TestCase):
+    def test_matcher_finds_overlapping_words(self):
+        """Автомат находит пересекающиеся и вложенные слова."""
+        matcher = WordMatcher(['he', 'she', 'his', 'hers'])
+        self.assertEqual(matcher.find('ushers'), 'he')
+        self.assertEqual(matcher.find('this'), 'his')
+        self.assertIsNone(matcher.find('hi'))
+
+    def test_matcher_reports_first_word_in_alphabetical_order(self):
+        """Из нескольких найденных слов называется первое по алфавиту."""
+        matcher = WordMatcher(['яблоко', 'арбуз'])
+        self.assertEqual(matcher.find('яблоко и арбуз'), 'арбуз')
+
+    def test_form_sees_new_word_without_restart(self):
+        """Добавленное слово сразу учитывается формой комментария."""
+        form = CommentForm(data={'text': 'Тёмный лорд'})
+        self.assertTrue(form.is_valid())
+        word = Word.objects.create(word='лорд')
+        form = CommentForm(data={'text': 'Тёмный лорд'})
+        self.assertFalse(form.is_valid())
+        word.delete()
+        form = CommentForm(data={'text': 'Тёмный лорд'})
+        self.assertTrue(form.is_valid())
+
+    @mock.patch.object(words, '_checked', None)
+    def test_matcher_sees_words_from_other_process(self):
+        """Словарь, изменённый другим процессом, подхватывается по штампу
+        не позже чем через CHECK_INTERVAL, а до того — без запросов.
+        """
+        with mock.patch.object(
+            words.time, 'monotonic', return_value=1000.0
+        ) as monotonic:
+            self.assertIsNone(words.get_matcher().find('Тёмный лорд'))
+            # Другой процесс пишет слово и штамп в базу, сигналы не идут.
+            Word.objects.bulk_create([Word(word='лорд')])
+            Version.objects.update_or_create(
+                name=words.VERSION_NAME, defaults={'stamp': time.time()}
+            )
+            with self.assertNumQueries(0):
+                self.assertIsNone(
+                    words.get_matcher().find('Тёмный лорд')
+                )
+            monotonic.return_value += words.CHECK_INTERVAL
+            self.assertEqual(
+                words.get_matcher().find('Тёмный лорд'), 'лорд'
+            )
@@ -1,10 +1,18 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
 
-from ..models import Comment, Follow, Group, Post, Word
+from ..models import Comment, Follow, Group, Post, StoredImage, Word
 
 User = get_user_model()
 
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
 NUMBER_OF_LETTERS = 15
 
 
@@ -165,3 +173,120 @@ class WordModelTest(TestCase):
             self.word._meta.get_field('word').verbose_name,
             'Запретное слово'
         )
+
+
+class CounterTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание'
+        )
+        cls.another_group = Group.objects.create(
+            title='Другая группа',
+            slug='test-slug-2',
+            description='Тестовое описание'
+        )
+
+    def refresh(self, *objects):
+        for obj in objects:
+            obj.refresh_from_db()
+
+    def test_post_counters(self):
+        """Счётчики постов автора и группы следят за постами."""
+        post = Post.objects.create(
+            author=self.author,
+            group=self.group,
+            text='Тестовый пост'
+        )
+        self.refresh(self.author.counter, self.group)
+        self.assertEqual(self.author.counter.posts_count, 1)
+        self.assertEqual(self.group.posts_count, 1)
+        post.group = self.another_group
+        post.save()
+        self.refresh(self.group, self.another_group)
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(self.another_group.posts_count, 1)
+        post.delete()
+        self.refresh(self.author.counter, self.another_group)
+        self.assertEqual(self.author.counter.posts_count, 0)
+        self.assertEqual(self.another_group.posts_count, 0)
+
+    def test_comment_counter(self):
+        """Счётчик комментариев поста следит за комментариями."""
+        post = Post.objects.create(author=self.author, text='Тестовый пост')
+        comment = Comment.objects.create(
+            post=post,
+            author=self.reader,
+            text='Комментарий'
+        )
+        self.refresh(post)
+        self.assertEqual(post.comments_count, 1)
+        comment.delete()
+        self.refresh(post)
+        self.assertEqual(post.comments_count, 0)
+
+    def test_follow_counters(self):
+        """Счётчики подписчиков и подписок следят за подписками."""
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.refresh(self.author.counter, self.reader.counter)
+        self.assertEqual(self.author.counter.followers_count, 1)
+        self.assertEqual(self.reader.counter.following_count, 1)
+        follow.delete()
+        self.refresh(self.author.counter, self.reader.counter)
+        self.assertEqual(self.author.counter.followers_count, 0)
+        self.assertEqual(self.reader.counter.following_count, 0)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class StoredImageTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, name, content=b'GIF89a-content'):
+        return Post.objects.create(
+            author=self.author,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile(name, content)
+        )
+
+    def test_same_content_is_stored_once(self):
+        """Одинаковые загрузки хранятся одним файлом с подсчётом ссылок."""
+        first = self.create_post('first.gif')
+        second = self.create_post('second.GIF')
+        other = self.create_post('other.gif', b'GIF89a-other')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertNotEqual(first.image.name, other.image.name)
+        self.assertRegex(
+            first.image.name, r'^posts/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}'
+            r'\.gif$'
+        )
+        directory = os.path.dirname(first.image.path)
+        self.assertEqual(len(os.listdir(directory)), 1)
+        stored = StoredImage.objects.get(name=first.image.name)
+        self.assertEqual(stored.references, 2)
+
+    def test_references_follow_posts(self):
+        """Ссылки снимаются при замене картинки и удалении поста."""
+        first = self.create_post('first.gif')
+        second = self.create_post('second.gif')
+        name = first.image.name
+        first.image = SimpleUploadedFile('new.gif', b'GIF89a-new')
+        first.save()
+        self.assertEqual(StoredImage.objects.get(name=name).references, 1)
+        self.assertEqual(
+            StoredImage.objects.get(name=first.image.name).references, 1
+        )
+        second.delete()
+        self.assertFalse(StoredImage.objects.filter(name=name).exists())
@@ -1,8 +1,16 @@
+import re
+from urllib.parse import parse_qsl
+
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from ..counters import reconcile
 from ..models import Follow, Group, Post
+from ..paginators import ON_EACH_SIDE, KeysetPaginator, page_window
 
 User = get_user_model()
 
@@ -30,6 +38,8 @@ class PaginatorViewsTest(TestCase):
             )
             posts_list.append(post)
         Post.objects.bulk_create(posts_list)
+        # bulk_create обходит сигналы: счётчики постов сверяются вручную.
+        reconcile()
         cls.user = User.objects.create_user(username='user')
         cls.follow = Follow.objects.create(
             user=cls.user,
@@ -69,3 +79,148 @@ class PaginatorViewsTest(TestCase):
                     len(second_page_response.context['page_obj']),
                     EXTRA_POSTS
                 )
+
+    def test_cursor_pages_follow_each_other(self):
+        """Переход по курсорам «вперёд» и «назад» отдаёт соседние
+        страницы без пропусков и повторов.
+        """
+        url = reverse('posts:index')
+        first_page = self.guest_client.get(url).context['page_obj']
+        self.assertIsNone(first_page.previous_cursor)
+        second_page = self.guest_client.get(
+            url, {'after': first_page.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(second_page.number, 2)
+        self.assertEqual(len(second_page), EXTRA_POSTS)
+        self.assertIsNone(second_page.next_cursor)
+        self.assertEqual(
+            {post.pk for post in [*first_page, *second_page]},
+            set(Post.objects.values_list('pk', flat=True))
+        )
+        previous_page = self.guest_client.get(
+            url, {'before': second_page.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(previous_page.number, 1)
+        self.assertEqual(list(previous_page), list(first_page))
+
+    def test_last_page_is_read_without_offset(self):
+        """Последняя страница читается с конца индекса, без OFFSET,
+        и совпадает со страницей по номеру.
+        """
+        url = reverse('posts:index')
+        first_page = self.guest_client.get(url)
+        self.assertContains(first_page, 'href="?before=last"')
+        expected = list(
+            Post.objects.order_by('-pub_date', '-id')[POSTS_ON_PAGE:]
+        )
+        for params in ({'before': 'last'}, {'page': 2}):
+            with self.subTest(params=params):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.guest_client.get(url, params)
+                page_obj = response.context['page_obj']
+                self.assertEqual(page_obj.number, 2)
+                self.assertEqual(list(page_obj), expected)
+                self.assertIsNone(page_obj.next_cursor)
+                self.assertFalse(any(
+                    'OFFSET' in query['sql']
+                    for query in queries.captured_queries
+                ))
+
+    def test_window_neighbours_are_cursor_links(self):
+        """Соседние номера окна ведут по курсору с пропуском не больше
+        пары страниц, а не по OFFSET от начала ленты.
+        """
+        per_page = 2
+        posts = list(Post.objects.order_by('-pub_date', '-id'))
+        for number in (3, 4):
+            page_obj = KeysetPaginator(
+                Post.objects.all(), per_page
+            ).get_page(number)
+            for target, link in page_obj.page_links:
+                if link is None:
+                    continue
+                with self.subTest(number=number, target=target):
+                    params = dict(parse_qsl(link))
+                    if target > 1 and abs(target - number) <= ON_EACH_SIDE:
+                        self.assertTrue(params.keys() & {'after', 'before'})
+                    paginator = KeysetPaginator(Post.objects.all(), per_page)
+                    with CaptureQueriesContext(connection) as queries:
+                        page = paginator.get_page(
+                            params.get('page'),
+                            after=params.get('after'),
+                            before=params.get('before')
+                        )
+                    self.assertEqual(page.number, target)
+                    start = (target - 1) * per_page
+                    self.assertEqual(
+                        list(page), posts[start:start + per_page]
+                    )
+                    offsets = [
+                        int(offset) for query in queries.captured_queries
+                        for offset in re.findall(r'OFFSET (\d+)', query['sql'])
+                    ]
+                    if 'page' not in params:
+                        self.assertLessEqual(
+                            max(offsets, default=0),
+                            per_page * (ON_EACH_SIDE - 1)
+                        )
+
+    def test_counters_replace_count_query(self):
+        """Группа и профиль берут число постов из счётчиков, без COUNT."""
+        cache.clear()
+        urls = (
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.guest_client.get(url)
+                paginator = response.context['page_obj'].paginator
+                self.assertEqual(paginator.count, NUMBER_OF_POSTS)
+                self.assertFalse(any(
+                    'COUNT(' in query['sql']
+                    for query in queries.captured_queries
+                ))
+
+    def test_broken_cursor_shows_first_page(self):
+        """Испорченный курсор открывает первую страницу."""
+        response = self.guest_client.get(
+            reverse('posts:index'), {'after': 'broken'}
+        )
+        self.assertEqual(response.context['page_obj'].number, 1)
+        self.assertEqual(len(response.context['page_obj']), POSTS_ON_PAGE)
+
+    def test_page_window_is_bounded(self):
+        """Окно номеров страниц ограничено соседями и краями."""
+        self.assertEqual(page_window(1, 3), [1, 2, 3])
+        self.assertEqual(page_window(1, 100), [1, 2, 3, None, 100])
+        self.assertEqual(
+            page_window(50, 100),
+            [1, None, 48, 49, 50, 51, 52, None, 100]
+        )
+        self.assertEqual(page_window(100, 100), [1, None, 98, 99, 100])
+
+    def test_cached_count_is_not_queried_again(self):
+        """Число записей для окна страниц берётся из кэша."""
+        cache.clear()
+        url = reverse('posts:index')
+        self.guest_client.get(url)
+        paginator = KeysetPaginator(
+            Post.objects.all(), POSTS_ON_PAGE, count_key='index'
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(paginator.count, NUMBER_OF_POSTS)
+
+    def test_page_out_of_range_shows_last_page(self):
+        """Номер страницы за концом ленты открывает последнюю страницу,
+        даже если в кэше устаревшее число записей.
+        """
+        cache.set('paginator_count:index', NUMBER_OF_POSTS * 10)
+        response = self.guest_client.get(
+            reverse('posts:index'), {'page': 5}
+        )
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.number, 2)
+        self.assertEqual(len(page_obj), EXTRA_POSTS)
+        cache.clear()
@@ -0,0 +1,89 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.another_author = User.objects.create_user(username='another')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание'
+        )
+        cls.text_post = Post.objects.create(
+            author=cls.author,
+            group=cls.group,
+            text='Ёжики варят грибной суп'
+        )
+        cls.comment_post = Post.objects.create(
+            author=cls.another_author,
+            text='Просто пост'
+        )
+        Comment.objects.create(
+            post=cls.comment_post,
+            author=cls.author,
+            text='А ёжики тут при чём?'
+        )
+        cls.other_post = Post.objects.create(
+            author=cls.author,
+            text='Совсем про другое'
+        )
+
+    def search(self, **params):
+        response = self.client.get(reverse('posts:search'), params)
+        self.assertEqual(response.status_code, 200)
+        return list(response.context['page_obj'])
+
+    def test_posts_ranked_by_text_then_comments(self):
+        """Совпадение в тексте поста выше совпадения в комментарии."""
+        self.assertEqual(
+            self.search(q='Ёжик'),
+            [self.text_post, self.comment_post]
+        )
+
+    def test_search_filters_by_group_and_author(self):
+        """Фильтры группы и автора сужают выдачу."""
+        self.assertEqual(
+            self.search(q='ёжики', group=self.group.slug),
+            [self.text_post]
+        )
+        self.assertEqual(
+            self.search(q='ёжики', author='another'),
+            [self.comment_post]
+        )
+
+    def test_index_follows_writes(self):
+        """Правка и удаление поста сразу видны в поиске."""
+        post = Post.objects.get(pk=self.text_post.pk)
+        post.text = 'Ёжики ушли'
+        post.save()
+        self.assertEqual(self.search(q='суп'), [])
+        Post.objects.filter(pk=self.other_post.pk).delete()
+        self.assertEqual(self.search(q='другое'), [])
+
+    def test_query_syntax_is_escaped(self):
+        """Операторы FTS5 во вводе не ломают запрос."""
+        self.assertEqual(self.search(q='"ёжики OR ('), [])
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке находит посты по индексу."""
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'грибной'}
+        )
+        self.assertEqual(
+            list(response.context['cl'].result_list),
+            [self.text_post]
+        )
@@ -1,5 +1,6 @@
 import shutil
 import tempfile
+from unittest import mock
 
 from django import forms
 from django.conf import settings
@@ -9,6 +10,9 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
+from core.backends import LocMemCache
+
+from .. import thumbnails
 from ..models import Comment, Follow, Group, Post
 
 User = get_user_model()
@@ -16,7 +20,7 @@ User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
 class PostViewsTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -35,6 +39,7 @@ class PostViewsTests(TestCase):
             b'\x02\x00\x01\x00\x00\x02\x02\x0C'
             b'\x0A\x00\x3B'
         )
+        cls.small_gif = small_gif
         cls.image = SimpleUploadedFile(
             name='small.gif',
             content=small_gif,
@@ -228,6 +233,94 @@ class PostViewsTests(TestCase):
         page_object = response.context.get('post')
         self.assertEqual(page_object.image, self.post.image)
 
+    def test_post_image_shows_placeholder_until_thumbnail_ready(self):
+        """Пока миниатюра не построена, вместо картинки стоит заглушка."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        response = self.authorized_client.get(url)
+        self.assertContains(response, 'Изображение обрабатывается')
+        thumbnails.generate(self.post.image.name)
+        response = self.authorized_client.get(url)
+        self.assertNotContains(response, 'Изображение обрабатывается')
+        self.assertContains(response, f'src="{settings.MEDIA_URL}cache/')
+
+    def test_thumbnails_are_prefetched_in_one_query(self):
+        """Миниатюры страницы читаются одним запросом, затем из LRU."""
+        cache.clear()
+        posts = [
+            Post.objects.create(
+                author=self.user,
+                text=f'Пост {number}',
+                image=SimpleUploadedFile(f'{number}.gif', self.small_gif)
+            )
+            for number in range(3)
+        ]
+        for post in posts:
+            thumbnails.generate(post.image.name)
+        cache.clear()
+        thumbnails._ready.clear()
+        with self.assertNumQueries(1):
+            thumbnails.prefetch(posts)
+        with self.assertNumQueries(0):
+            thumbnails.prefetch(posts)
+        for post in posts:
+            self.assertEqual(post.thumbnail.width, 960)
+            self.assertEqual(
+                [width.split()[-1] for width in
+                 post.thumbnail.srcset.split(', ')],
+                ['480w', '960w', '1440w']
+            )
+
+    def test_delete_skips_image_referenced_again(self):
+        """Файл, на который снова ссылается пост, не удаляется."""
+        name = self.post.image.name
+        thumbnails.delete(name)
+        self.assertTrue(self.post.image.storage.exists(name))
+
+    def test_failed_build_is_retried_after_backoff(self):
+        """Упавшее построение повторяется только через RETRY_AFTER."""
+        name = 'posts/broken.gif'
+        self.addCleanup(thumbnails._pending.pop, name, None)
+        with mock.patch.object(
+            thumbnails.default.backend, 'generate', side_effect=OSError
+        ) as generate, mock.patch.object(
+            thumbnails.time, 'monotonic', return_value=1000.0
+        ) as monotonic:
+            thumbnails.submit(name)
+            thumbnails.submit(name)
+            self.assertEqual(generate.call_count, 1)
+            monotonic.return_value += thumbnails.RETRY_AFTER
+            thumbnails.submit(name)
+            self.assertEqual(generate.call_count, 2)
+
+    def test_modern_formats_become_picture_sources(self):
+        """Варианты WebP и AVIF попадают в <source>, JPEG — в <img>."""
+        variants = [
+            thumbnails.Variant(image_format, f'{width}x1', {})
+            for image_format in ('WEBP', 'JPEG')
+            for width in (480, 960)
+        ]
+        variants[-1] = variants[-1]._replace(
+            geometry=thumbnails.CARD_GEOMETRY
+        )
+        images = [
+            thumbnails.Resized(f'/{image_format}/{width}', width, 1)
+            for image_format in ('webp', 'jpg')
+            for width in (480, 960)
+        ]
+        with mock.patch.object(
+            thumbnails, 'variant_formats', return_value=('WEBP', 'JPEG')
+        ):
+            thumbnail = thumbnails.build_thumbnail(variants, images)
+        self.assertEqual(thumbnail.url, '/jpg/960')
+        self.assertEqual(thumbnail.srcset, '/jpg/480 480w, /jpg/960 960w')
+        self.assertEqual(
+            thumbnail.sources,
+            [('image/webp', '/webp/480 480w, /webp/960 960w')]
+        )
+        self.assertIsNone(
+            thumbnails.build_thumbnail(variants[:2], images[:2])
+        )
+
     def test_comment_show_on_post_page(self):
         """Комментарий появляется на странице поста."""
         response = self.author_client.get(
@@ -236,11 +329,37 @@ class PostViewsTests(TestCase):
         comment = response.context['comments'][0]
         self.assertEqual(comment, PostViewsTests.comment)
 
+    def test_comments_are_paginated_by_cursor(self):
+        """Первая страница комментариев встроена, остальные — фрагментом."""
+        Comment.objects.bulk_create([
+            Comment(post=self.post, author=self.user, text=f'Ответ {number}')
+            for number in range(25)
+        ])
+        self.post.refresh_from_db()
+        response = self.author_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        first_page = response.context['comments']
+        self.assertEqual(len(first_page), 20)
+        self.assertIsNotNone(first_page.next_cursor)
+        fragment = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.pk}),
+            {'after': first_page.next_cursor}
+        )
+        second_page = fragment.context['comments']
+        self.assertEqual(len(second_page), 6)
+        self.assertIsNone(second_page.next_cursor)
+        self.assertTemplateUsed(fragment, 'posts/includes/comment_list.html')
+        self.assertTemplateNotUsed(fragment, 'base.html')
+        shown = [*first_page, *second_page]
+        self.assertEqual(len({comment.pk for comment in shown}), 26)
+        self.assertIn(PostViewsTests.comment, second_page)
+
     def test_posts_on_index_page_save_in_cache(self):
         """Список записей страницы index хранится в кэше"""
         response = self.author_client.get(reverse('posts:index'))
         content = response.content.decode()
-        self.post.delete()
+        Post.objects.filter(pk=self.post.pk).update(text='Изменён в обход')
         second_response = self.author_client.get(reverse('posts:index'))
         second_content = second_response.content.decode()
         self.assertEqual(content, second_content)
@@ -249,6 +368,19 @@ class PostViewsTests(TestCase):
         third_content = third_response.content.decode()
         self.assertNotEqual(content, third_content)
 
+    def test_index_cache_rolls_over_on_post_changes(self):
+        """Новый и удалённый пост сразу видны на главной, несмотря на кэш."""
+        self.author_client.get(reverse('posts:index'))
+        new_post = Post.objects.create(
+            author=PostViewsTests.user,
+            text='Свежий пост'
+        )
+        content = self.author_client.get(reverse('posts:index')).content
+        self.assertIn('Свежий пост', content.decode())
+        new_post.delete()
+        content = self.author_client.get(reverse('posts:index')).content
+        self.assertNotIn('Свежий пост', content.decode())
+
     def test_profile_follow(self):
         """Авторизованный пользователь может подписываться
         на других пользователей.
@@ -291,3 +423,187 @@ class PostViewsTests(TestCase):
         another_follow_post = len(another_response.context['page_obj'])
         self.assertEqual(follow_post, autor_post)
         self.assertEqual(another_follow_post, 0)
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='auth',
+            first_name='Иван'
+        )
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.author_client = Client()
+        self.author_client.force_login(PostCardCacheTests.user)
+        self.url = reverse(
+            'posts:profile',
+            kwargs={'username': self.user.username}
+        )
+
+    def get_content(self):
+        return self.guest_client.get(self.url).content.decode()
+
+    def test_card_is_served_from_cache(self):
+        """Карточка поста берётся из кэша, пока пост не менялся."""
+        self.get_content()
+        Post.objects.filter(pk=self.post.pk).update(text='Изменён в обход')
+        self.assertIn('Тестовый пост', self.get_content())
+
+    def test_card_is_rerendered_after_edit(self):
+        """Правка поста через post_edit обновляет карточку."""
+        self.get_content()
+        self.author_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+            data={'text': 'Отредактированный пост'}
+        )
+        self.assertIn('Отредактированный пост', self.get_content())
+
+    def test_card_is_rerendered_after_author_rename(self):
+        """Смена имени автора обновляет его карточки."""
+        self.get_content()
+        self.user.first_name = 'Пётр'
+        self.user.save()
+        self.assertIn('Пётр', self.get_content())
+
+    def test_card_is_rerendered_in_every_worker(self):
+        """Правку в одном процессе видят карточки в кэше другого."""
+        workers = [LocMemCache(name, {}) for name in ('worker-a', 'worker-b')]
+        for worker in workers:
+            worker.clear()
+        with mock.patch('core.templatetags.post_list.cache', workers[0]):
+            self.assertIn('Иван', self.get_content())
+        with mock.patch('core.templatetags.post_list.cache', workers[1]):
+            self.user.first_name = 'Пётр'
+            self.user.save()
+            self.post.text = 'Отредактированный пост'
+            self.post.save()
+        with mock.patch('core.templatetags.post_list.cache', workers[0]):
+            content = self.get_content()
+        self.assertIn('Пётр', content)
+        self.assertIn('Отредактированный пост', content)
+
+    def test_card_drops_deleted_group(self):
+        """После удаления группы главная не ссылается на неё."""
+        group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание'
+        )
+        Post.objects.create(author=self.user, group=group, text='В группе')
+        url = reverse('posts:index')
+        group_url = reverse('posts:group_list', kwargs={'slug': 'test-slug'})
+        self.assertIn(group_url, self.guest_client.get(url).content.decode())
+        group.delete()
+        self.assertNotIn(
+            group_url, self.guest_client.get(url).content.decode()
+        )
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.author, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(ConditionalGetTests.reader)
+
+    def revalidate(self, url):
+        response = self.reader_client.get(url)
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+        return self.reader_client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        ).status_code
+
+    def test_unchanged_pages_answer_not_modified(self):
+        """Неизменившиеся страницы отвечают 304 на If-None-Match."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': 'auth'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.revalidate(url), 304)
+
+    def test_changes_reset_validators(self):
+        """Новый пост, комментарий и подписка меняют ETag."""
+        cases = (
+            (
+                reverse('posts:index'),
+                lambda: Post.objects.create(author=self.author, text='Новый')
+            ),
+            (
+                reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+                lambda: Comment.objects.create(
+                    post=self.post, author=self.reader, text='Комментарий'
+                )
+            ),
+            (
+                reverse('posts:profile', kwargs={'username': 'auth'}),
+                lambda: Follow.objects.create(
+                    user=self.reader, author=self.author
+                )
+            ),
+        )
+        for url, change in cases:
+            with self.subTest(url=url):
+                etag = self.reader_client.get(url)['ETag']
+                change()
+                response = self.reader_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_comment_edit_resets_validators(self):
+        """Правка текста комментария (например, в админке) меняет ETag."""
+        comment = Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        etag = self.reader_client.get(url)['ETag']
+        comment.text = 'Исправленный комментарий'
+        comment.save()
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_group_delete_resets_validators(self):
+        """Удаление группы меняет ETag страниц со ссылками на неё."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': 'auth'}),
+        )
+        for number, url in enumerate(urls):
+            with self.subTest(url=url):
+                group = Group.objects.create(
+                    title='Тестовая группа',
+                    slug=f'test-slug-{number}',
+                    description='Тестовое описание'
+                )
+                Post.objects.create(
+                    author=self.author, group=group, text='В группе'
+                )
+                etag = self.reader_client.get(url)['ETag']
+                group.delete()
+                response = self.reader_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_depends_on_viewer(self):
+        """Гость и пользователь получают разные ETag."""
+        url = reverse('posts:index')
+        etag = self.reader_client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,439 @@
+import logging
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from django.db import close_old_connections, transaction
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.base import EXTENSIONS, ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings
+from sorl.thumbnail.helpers import serialize, tokey
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore as CachedDBStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from . import cards
+
+logger = logging.getLogger(__name__)
+
+CARD_WIDTH = 960
+
+CARD_HEIGHT = 339
+
+CARD_GEOMETRY = f'{CARD_WIDTH}x{CARD_HEIGHT}'
+
+CARD_OPTIONS = {'crop': 'center', 'upscale': True}
+
+# Ширины вариантов карточки для srcset.
+CARD_WIDTHS = (480, 960, 1440)
+
+# Карточка занимает всю ширину колонки, но не шире 960px.
+CARD_SIZES = f'(min-width: 992px) {CARD_WIDTH}px, 100vw'
+
+# Форматы в порядке предпочтения; последний понимают все браузеры.
+VARIANT_FORMATS = ('AVIF', 'WEBP', 'JPEG')
+
+FALLBACK_FORMAT = 'JPEG'
+
+MIME_TYPES = {
+    'AVIF': 'image/avif',
+    'WEBP': 'image/webp',
+    'JPEG': 'image/jpeg',
+}
+
+FORMAT_EXTENSIONS = {**EXTENSIONS, 'AVIF': 'avif'}
+
+# Потоков по умолчанию; настройка THUMBNAIL_WORKERS = 0 строит и удаляет
+# файлы сразу в вызывающем потоке.
+WORKERS = 2
+
+# Через сколько секунд снова пробовать построить миниатюры после ошибки.
+RETRY_AFTER = 60 * 10
+
+LRU_SIZE = 1024
+
+MISSING_TIMEOUT = 60
+
+Variant = namedtuple('Variant', 'format geometry options')
+
+Resized = namedtuple('Resized', 'url width height')
+
+Thumbnail = namedtuple('Thumbnail', 'url width height srcset sizes sources')
+
+_executor = None
+
+# Имя исходника → None, пока построение в очереди, или время ошибки.
+_pending = {}
+
+_lock = threading.Lock()
+
+
+class LRU:
+    """Ограниченный по размеру словарь, вытесняющий давние записи."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_many(self, keys):
+        found = {}
+        with self.lock:
+            for key in keys:
+                if key in self.data:
+                    self.data.move_to_end(key)
+                    found[key] = self.data[key]
+        return found
+
+    def set_many(self, mapping):
+        with self.lock:
+            self.data.update(mapping)
+            for key in mapping:
+                self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def delete_many(self, keys):
+        with self.lock:
+            for key in keys:
+                self.data.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+_ready = LRU(LRU_SIZE)
+
+
+class KVStore(CachedDBStore):
+    """Хранилище ключей sorl с пакетным чтением.
+
+    Записи берутся из кэша одним get_many, недостающие — из базы одним
+    запросом с IN. Отсутствие миниатюры кэшируется ненадолго: её может
+    достроить фоновый поток другого процесса.
+    """
+
+    def _get_many_raw(self, keys):
+        values = self.cache.get_many(keys)
+        missing = [key for key in keys if key not in values]
+        if missing:
+            stored = dict(
+                KVStoreModel.objects.filter(
+                    key__in=missing
+                ).values_list('key', 'value')
+            )
+            absent = {key: EMPTY_VALUE for key in missing if key not in stored}
+            self.cache.set_many(stored, settings.THUMBNAIL_CACHE_TIMEOUT)
+            self.cache.set_many(absent, MISSING_TIMEOUT)
+            values.update(stored)
+        return {
+            key: value for key, value in values.items()
+            if value != EMPTY_VALUE
+        }
+
+    def _get_raw(self, key):
+        return self._get_many_raw([key]).get(key)
+
+    def get_many(self, image_files):
+        raw_keys = {add_prefix(image.key): image.key for image in image_files}
+        values = self._get_many_raw(list(raw_keys))
+        return {
+            raw_keys[key]: deserialize_image_file(value)
+            for key, value in values.items() if value
+        }
+
+
+class PregeneratedBackend(ThumbnailBackend):
+    """Отдаёт только готовые миниатюры, не открывая исходник.
+
+    Если миниатюры ещё нет в хранилище ключей sorl, тег {% thumbnail %}
+    получает None и выводит блок {% empty %}, а построение уходит
+    в фоновый поток.
+    """
+
+    def get_options(self, source, options):
+        # Те же значения по умолчанию, что подставляет sorl: от них
+        # зависит имя файла миниатюры.
+        if settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        return options
+
+    def thumbnail_file(self, file_, geometry_string, **options):
+        source = ImageFile(file_)
+        options = self.get_options(source, options)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def lookup(self, file_, geometry_string, **options):
+        return default.kvstore.get(
+            self.thumbnail_file(file_, geometry_string, **options)
+        )
+
+    def _get_thumbnail_filename(self, source, geometry_string, options):
+        # То же имя, что у sorl, но с расширениями форматов, которых
+        # sorl не знает (AVIF).
+        key = tokey(source.key, geometry_string, serialize(options))
+        extension = FORMAT_EXTENSIONS[options['format']]
+        return (
+            f'{settings.THUMBNAIL_PREFIX}{key[:2]}/{key[2:4]}/{key}'
+            f'.{extension}'
+        )
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        thumbnail = self.lookup(file_, geometry_string, **options)
+        if thumbnail is None:
+            schedule(file_.name, [Variant(None, geometry_string, options)])
+        return thumbnail
+
+    def generate(self, file_, variants):
+        """Строит недостающие варианты, декодируя исходник один раз."""
+        source = ImageFile(file_)
+        files = [
+            self.thumbnail_file(source, variant.geometry, **variant.options)
+            for variant in variants
+        ]
+        ready = default.kvstore.get_many(files)
+        missing = [
+            (variant, thumbnail)
+            for variant, thumbnail in zip(variants, files)
+            if thumbnail.key not in ready
+        ]
+        # Файл мог остаться от прежней записи в хранилище ключей: его
+        # не перезаписываем, иначе хранилище файлов выдаст новое имя.
+        absent = [
+            (variant, thumbnail) for variant, thumbnail in missing
+            if not thumbnail.exists()
+        ]
+        if absent:
+            self.create_variants(source, absent)
+        if missing:
+            default.kvstore.get_or_set(source)
+        for _, thumbnail in missing:
+            default.kvstore.set(thumbnail, source)
+
+    def create_variants(self, source, variants):
+        source_image = default.engine.get_image(source)
+        try:
+            source.set_size(default.engine.get_image_size(source_image))
+            image_info = default.engine.get_image_info(source_image)
+            for variant, thumbnail in variants:
+                options = self.get_options(source, dict(variant.options))
+                options['image_info'] = image_info
+                self._create_thumbnail(
+                    source_image, variant.geometry, options, thumbnail
+                )
+        finally:
+            default.engine.cleanup(source_image)
+
+
+@lru_cache()
+def variant_formats():
+    """Форматы из VARIANT_FORMATS, которые умеет сохранять Pillow."""
+    Image.init()
+    return tuple(
+        image_format for image_format in VARIANT_FORMATS
+        if image_format in Image.SAVE
+    )
+
+
+def card_variants():
+    """Варианты карточки: каждая ширина в каждом доступном формате."""
+    return [
+        Variant(
+            image_format,
+            f'{width}x{round(width * CARD_HEIGHT / CARD_WIDTH)}',
+            {**CARD_OPTIONS, 'format': image_format}
+        )
+        for image_format in variant_formats()
+        for width in CARD_WIDTHS
+    ]
+
+
+def source_file(name):
+    """Исходник в хранилище поля Post.image: от него зависят имена миниатюр."""
+    from .models import Post
+
+    return ImageFile(name, Post._meta.get_field('image').storage)
+
+
+def in_thread(func, *args):
+    try:
+        func(*args)
+    finally:
+        # Соединение с базой у потока своё: закрываем его так же,
+        # как Django закрывает соединение после запроса.
+        close_old_connections()
+
+
+def run(func, *args):
+    """Выполняет func в фоновом потоке или сразу, если потоков 0."""
+    global _executor
+    workers = getattr(settings, 'THUMBNAIL_WORKERS', WORKERS)
+    if not workers:
+        func(*args)
+        return
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix='thumbnails'
+            )
+    _executor.submit(in_thread, func, *args)
+
+
+def generate(name, variants=None):
+    """Строит варианты и сбрасывает кэш карточек с этим изображением."""
+    from .models import Post
+
+    variants = variants or card_variants()
+    try:
+        default.backend.generate(source_file(name), variants)
+        post_ids = Post.objects.filter(image=name).values_list('pk', flat=True)
+        cards.invalidate(
+            cards.INDEX_VERSION, *(f'post:{pk}' for pk in post_ids)
+        )
+    except Exception:
+        # Битый исходник не перестраивается при каждом показе страницы:
+        # следующая попытка — не раньше чем через RETRY_AFTER.
+        logger.exception('Не удалось построить миниатюры %s', name)
+        with _lock:
+            _pending[name] = time.monotonic()
+    else:
+        with _lock:
+            _pending.pop(name, None)
+
+
+def submit(name, variants=None):
+    with _lock:
+        if name in _pending:
+            failed = _pending[name]
+            if failed is None or time.monotonic() - failed < RETRY_AFTER:
+                return
+        _pending[name] = None
+    run(generate, name, variants)
+
+
+def schedule(name, variants=None):
+    """Ставит построение вариантов в очередь после фиксации транзакции."""
+    if name:
+        transaction.on_commit(lambda: submit(name, variants))
+
+
+def delete(name):
+    """Удаляет файл изображения вместе со всеми его миниатюрами.
+
+    Файл пропускается, если на него снова ссылается пост: хранилище
+    адресует файлы по содержимому, и ту же картинку могли загрузить
+    заново, пока удаление ждало своей очереди.
+    """
+    from .models import StoredImage
+
+    if StoredImage.objects.filter(name=name, references__gt=0).exists():
+        return
+    source = source_file(name)
+    try:
+        _ready.delete_many([
+            default.backend.thumbnail_file(
+                source, variant.geometry, **variant.options
+            ).key
+            for variant in card_variants()
+        ])
+        default.kvstore.delete(source)
+        source.delete()
+    except Exception:
+        logger.exception('Не удалось удалить изображение %s', name)
+
+
+def discard(name):
+    """Удаляет файл после фиксации транзакции, обычно в фоне."""
+    if name:
+        transaction.on_commit(lambda: run(delete, name))
+
+
+def srcset(images):
+    return ', '.join(
+        f'{image.url} {image.width}w'
+        for image in sorted(images, key=lambda image: image.width)
+    )
+
+
+def prefetch(posts):
+    """Проставляет post.thumbnail всем постам страницы разом.
+
+    Готовые варианты берутся из LRU процесса, остальные — одним
+    пакетным чтением хранилища ключей. Если чего-то не хватает,
+    построение ставится в очередь; без основного JPEG у поста остаётся
+    None, и шаблон выводит заглушку.
+    """
+    variants = card_variants()
+    files = {}
+    for post in posts:
+        post.thumbnail = None
+        if post.image:
+            files[post.pk] = [
+                default.backend.thumbnail_file(
+                    post.image, variant.geometry, **variant.options
+                )
+                for variant in variants
+            ]
+    found = _ready.get_many(
+        file_.key for post_files in files.values() for file_ in post_files
+    )
+    missing = [
+        file_ for post_files in files.values() for file_ in post_files
+        if file_.key not in found
+    ]
+    if missing:
+        ready = {
+            key: Resized(image.url, image.width, image.height)
+            for key, image in default.kvstore.get_many(missing).items()
+        }
+        _ready.set_many(ready)
+        found.update(ready)
+    for post in posts:
+        if post.pk in files:
+            images = [found.get(file_.key) for file_ in files[post.pk]]
+            post.thumbnail = build_thumbnail(variants, images)
+            if None in images:
+                schedule(post.image.name)
+
+
+def build_thumbnail(variants, images):
+    by_format = {}
+    fallback = None
+    for variant, image in zip(variants, images):
+        if image is None:
+            continue
+        by_format.setdefault(variant.format, []).append(image)
+        if (
+            variant.format == FALLBACK_FORMAT
+            and variant.geometry == CARD_GEOMETRY
+        ):
+            fallback = image
+    if fallback is None:
+        return None
+    sources = [
+        (MIME_TYPES[image_format], srcset(by_format[image_format]))
+        for image_format in variant_formats()
+        if image_format != FALLBACK_FORMAT and image_format in by_format
+    ]
+    return Thumbnail(
+        fallback.url,
+        fallback.width,
+        fallback.height,
+        srcset(by_format[FALLBACK_FORMAT]),
+        CARD_SIZES,
+        sources
+    )
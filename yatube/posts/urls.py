@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 app_name = 'posts'
 
@@ -30,6 +30,11 @@ urlpatterns = [
         views.profile_unfollow,
         name='profile_unfollow'
     ),
+    path(
+        'profile/<str:username>/export/',
+        views.profile_export,
+        name='profile_export'
+    ),
     path(
         'profile/<str:username>/',
         views.profile,
@@ -40,6 +45,11 @@ urlpatterns = [
         views.add_comment,
         name='add_comment'
     ),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
     path(
         'posts/<int:post_id>/edit/',
         views.post_edit,
@@ -50,9 +60,44 @@ urlpatterns = [
         views.post_detail,
         name='post_detail'
     ),
+    path(
+        'search/',
+        views.search,
+        name='search'
+    ),
     path(
         'create/',
         views.post_create,
         name='post_create'
+    ),
+    path(
+        'api/posts/',
+        api.index,
+        name='api_index'
+    ),
+    path(
+        'api/group/<slug:slug>/',
+        api.group_posts,
+        name='api_group_list'
+    ),
+    path(
+        'api/profile/<str:username>/',
+        api.profile,
+        name='api_profile'
+    ),
+    path(
+        'api/follow/',
+        api.follow_index,
+        name='api_follow_index'
+    ),
+    path(
+        'api/posts/<int:post_id>/',
+        api.post_detail,
+        name='api_post_detail'
+    ),
+    path(
+        'api/posts/<int:post_id>/comments/',
+        api.post_comments,
+        name='api_post_comments'
     )
 ]
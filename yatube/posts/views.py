@@ -2,38 +2,80 @@ from urllib.parse import urlencode
 
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import PermissionDenied
 from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 
+from .cards import attach_card_versions, index_version
 from .decorators import author_only
-from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post
+from .export import CONTENT_TYPES, FORMATS, export, extension
+from .feeds import FeedPaginator, pulled_authors
+from .forms import CommentForm, PostForm, SearchForm
+from .freshness import (conditional, feed_freshness, post_freshness,
+                        profile_freshness)
+from .models import Follow, Group, Post, Timeline
+from .paginators import KeysetPaginator, page_window
+from .search import PostSearch
+from .thumbnails import prefetch, schedule
 
 User = get_user_model()
 
 PAGINATOR_NUMBER = 10
 
+COMMENTS_NUMBER = 20
 
-def get_paginator(request, objects):
-    paginator = Paginator(objects, PAGINATOR_NUMBER)
-    page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
 
+def get_paginator(request, objects, count_key=None,
+                  paginator_class=KeysetPaginator, **kwargs):
+    paginator = paginator_class(
+        objects,
+        PAGINATOR_NUMBER,
+        count_key=count_key,
+        **kwargs
+    )
+    page_obj = paginator.get_page(
+        request.GET.get('page'),
+        after=request.GET.get('after'),
+        before=request.GET.get('before')
+    )
+    attach_card_versions(page_obj)
+    prefetch(page_obj)
+    return page_obj
+
+
+def get_comments_page(request, post):
+    paginator = KeysetPaginator(
+        post.comments.select_related('author'),
+        COMMENTS_NUMBER,
+        keys=('created', 'id'),
+        known_count=post.comments_count
+    )
+    return paginator.get_page(after=request.GET.get('after'))
 
+
+@conditional(feed_freshness)
 def index(request):
     template = 'posts/index.html'
     post_list = Post.objects.select_related('author', 'group').all()
-    page_obj = get_paginator(request, post_list)
-    context = {'page_obj': page_obj}
+    page_obj = get_paginator(request, post_list, 'index')
+    context = {
+        'page_obj': page_obj,
+        'index_version': index_version()
+    }
     return render(request, template, context)
 
 
+@conditional(feed_freshness)
 def group_posts(request, slug):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
     post_list = group.posts.select_related('author').all()
-    page_obj = get_paginator(request, post_list)
+    page_obj = get_paginator(
+        request, post_list, known_count=group.posts_count
+    )
     context = {
         'group': group,
         'page_obj': page_obj
@@ -41,11 +83,17 @@ def group_posts(request, slug):
     return render(request, template, context)
 
 
+@conditional(profile_freshness)
 def profile(request, username):
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('counter'),
+        username=username
+    )
     post_list = author.posts.select_related('author', 'group').all()
-    page_obj = get_paginator(request, post_list)
+    page_obj = get_paginator(
+        request, post_list, known_count=author.counter.posts_count
+    )
     following = request.user.is_authenticated and Follow.objects.filter(
         user=request.user,
         author=author
@@ -58,14 +106,37 @@ def profile(request, username):
     return render(request, template, context)
 
 
+@login_required
+def profile_export(request, username):
+    author = get_object_or_404(User, username=username)
+    if request.user != author and not request.user.is_staff:
+        raise PermissionDenied
+    data_format = request.GET.get('format')
+    if data_format not in FORMATS:
+        data_format = FORMATS[0]
+    archive = 'zip' in request.GET
+    with_images = 'images' in request.GET
+    kind = extension(data_format, archive, with_images)
+    response = StreamingHttpResponse(
+        export(author, data_format, archive, with_images),
+        content_type=CONTENT_TYPES[kind]
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{author.username}-export.{kind}"'
+    )
+    return response
+
+
+@conditional(post_freshness)
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
     post = get_object_or_404(
-        Post.objects.select_related('author', 'group'),
+        Post.objects.select_related('author__counter', 'group'),
         id=post_id
     )
+    prefetch([post])
     form = CommentForm(request.GET)
-    comments = post.comments.select_related('author').all()
+    comments = get_comments_page(request, post)
     context = {
         'post': post,
         'form': form,
@@ -74,13 +145,56 @@ def post_detail(request, post_id):
     return render(request, template, context)
 
 
+def post_comments(request, post_id):
+    post = get_object_or_404(
+        Post.objects.only('pk', 'comments_count'),
+        id=post_id
+    )
+    template = 'posts/includes/comment_list.html'
+    context = {
+        'post': post,
+        'comments': get_comments_page(request, post)
+    }
+    return render(request, template, context)
+
+
+def search(request):
+    template = 'posts/search.html'
+    form = SearchForm(request.GET or None)
+    page_obj = None
+    if form.is_valid():
+        results = PostSearch(
+            form.cleaned_data['q'],
+            group=form.cleaned_data['group'],
+            author=form.cleaned_data['author']
+        )
+        page_obj = Paginator(results, PAGINATOR_NUMBER).get_page(
+            request.GET.get('page')
+        )
+        page_obj.page_window = page_window(
+            page_obj.number, page_obj.paginator.num_pages
+        )
+        attach_card_versions(page_obj)
+        prefetch(page_obj)
+    query = request.GET.copy()
+    query.pop('page', None)
+    context = {
+        'form': form,
+        'page_obj': page_obj,
+        'query': query.urlencode()
+    }
+    return render(request, template, context)
+
+
 @login_required
+@transaction.atomic
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        schedule(post.image.name)
         return redirect('posts:profile', username=request.user)
     template = 'posts/create_post.html'
     context = {'form': form}
@@ -89,6 +203,7 @@ def post_create(request):
 
 @login_required
 @author_only
+@transaction.atomic
 def post_edit(request, post_id):
     template = 'posts/create_post.html'
     post = get_object_or_404(Post, id=post_id)
@@ -98,7 +213,9 @@ def post_edit(request, post_id):
         instance=post
     )
     if form.is_valid():
-        form.save()
+        post = form.save()
+        if 'image' in form.changed_data:
+            schedule(post.image.name)
         return redirect('posts:post_detail', post_id)
     is_edit = True
     context = {
@@ -109,6 +226,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
@@ -126,15 +244,20 @@ def add_comment(request, post_id):
 @login_required
 def follow_index(request):
     template = 'posts/follow.html'
-    post_list = Post.objects.select_related('author', 'group').filter(
-        author__following__user=request.user
+    timeline = Timeline.objects.filter(user=request.user)
+    page_obj = get_paginator(
+        request,
+        timeline,
+        f'follow:{request.user.pk}',
+        FeedPaginator,
+        authors=pulled_authors(request.user)
     )
-    page_obj = get_paginator(request, post_list)
     context = {'page_obj': page_obj}
     return render(request, template, context)
 
 
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if request.user != author:
@@ -146,6 +269,7 @@ def profile_follow(request, username):
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     Follow.objects.get(
         user=request.user,
@@ -0,0 +1,95 @@
+import time
+from collections import deque
+
+from core.versions import bump_version, get_version
+
+from .models import Word
+
+VERSION_NAME = 'words'
+
+# Как часто процесс сверяет штамп словаря с базой, в секундах: правка
+# словаря в другом процессе доходит до форм не позже, чем через столько.
+CHECK_INTERVAL = 5
+
+
+class WordMatcher:
+    """Автомат Ахо — Корасик по словарю запретных слов.
+
+    Находит все вхождения всех слов за один проход по тексту,
+    сколько бы слов ни было в словаре.
+    """
+
+    def __init__(self, words):
+        self.words = sorted({word for word in words if word})
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [set()]
+        for index, word in enumerate(self.words):
+            state = 0
+            for char in word:
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(set())
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            self.output[state].add(index)
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, target in self.goto[state].items():
+                queue.append(target)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[target] = self.goto[fallback].get(char, 0)
+                self.output[target] |= self.output[self.fail[target]]
+
+    def find(self, text):
+        """Первое по алфавиту слово словаря, встретившееся в тексте."""
+        found = set()
+        state = 0
+        for char in text:
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            found |= self.output[state]
+        if found:
+            return self.words[min(found)]
+        return None
+
+
+_matcher = (None, WordMatcher(()))
+
+# Когда (time.monotonic()) штамп словаря сверялся с базой; None — сверить
+# при следующем обращении.
+_checked = None
+
+
+def get_matcher():
+    """Автомат текущего процесса, пересобранный при смене словаря.
+
+    Штамп словаря читается из базы до самих слов, но не чаще раза
+    в CHECK_INTERVAL: проверка комментария обычно обходится без базы,
+    а правку словаря в любом процессе замечают все.
+    """
+    global _matcher, _checked
+    now = time.monotonic()
+    if _checked is not None and 0 <= now - _checked < CHECK_INTERVAL:
+        return _matcher[1]
+    version = get_version(VERSION_NAME)
+    _checked = now
+    built_for, matcher = _matcher
+    if built_for != version:
+        matcher = WordMatcher(Word.objects.values_list('word', flat=True))
+        _matcher = (version, matcher)
+    return matcher
+
+
+def invalidate():
+    global _checked
+    # Штамп пишется в той же транзакции, что и слово: другой процесс
+    # видит новый штамп только вместе с новым словарём. Этот процесс
+    # сверяется с базой сразу, не дожидаясь CHECK_INTERVAL.
+    bump_version(VERSION_NAME)
+    _checked = None
@@ -0,0 +1,98 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from core.budget import QueryBudgetMixin
+
+from .. import urls
+
+User = get_user_model()
+
+# Бюджет запросов к базе на ответ каждого представления users.
+BUDGETS = {
+    'users:signup': 7,
+    'users:logout': 4,
+    'users:login': 9,
+    'users:password_change_done': 2,
+    'users:password_change': 2,
+    'users:password_reset_done': 0,
+    'users:password_reset': 1,
+    'users:password_reset_complete': 1,
+    'users:password_reset_confirm': 5,
+}
+
+
+class UserQueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='TestUser',
+            email='test@example.com',
+            password='old-password-123'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(UserQueryBudgetTests.user)
+
+    def get_cases(self):
+        """Запросы к представлениям: имя, клиент, метод, адрес, данные
+        и ожидаемый код ответа. Вход меняет last_login и гасит ссылку
+        сброса пароля, поэтому он идёт после неё.
+        """
+        confirm = {
+            'uidb64': urlsafe_base64_encode(force_bytes(self.user.pk)),
+            'token': default_token_generator.make_token(self.user),
+        }
+        return [
+            ('users:signup', self.guest_client, 'post',
+             reverse('users:signup'),
+             {
+                 'first_name': 'Новый',
+                 'last_name': 'Пользователь',
+                 'username': 'NewUser',
+                 'email': 'new@example.com',
+                 'password1': 'new-password-123',
+                 'password2': 'new-password-123',
+             }, 302),
+            ('users:password_change', self.authorized_client, 'get',
+             reverse('users:password_change'), None, 200),
+            ('users:password_change_done', self.authorized_client, 'get',
+             reverse('users:password_change_done'), None, 200),
+            ('users:password_reset', self.guest_client, 'post',
+             reverse('users:password_reset'),
+             {'email': 'test@example.com'}, 302),
+            ('users:password_reset_done', self.guest_client, 'get',
+             reverse('users:password_reset_done'), None, 200),
+            ('users:password_reset_confirm', self.guest_client, 'get',
+             reverse('users:password_reset_confirm', kwargs=confirm),
+             None, 302),
+            ('users:password_reset_complete', self.guest_client, 'get',
+             reverse('users:password_reset_complete'), None, 200),
+            ('users:login', Client(), 'post',
+             reverse('users:login'),
+             {'username': 'TestUser', 'password': 'old-password-123'}, 302),
+            ('users:logout', self.authorized_client, 'get',
+             reverse('users:logout'), None, 200),
+        ]
+
+    def test_every_view_has_budget(self):
+        """У каждого адреса users есть бюджет и проверка."""
+        names = {f'{urls.app_name}:{url.name}' for url in urls.urlpatterns}
+        self.assertEqual(set(BUDGETS), names)
+        self.assertEqual({case[0] for case in self.get_cases()}, names)
+
+    def test_views_stay_within_budget(self):
+        """Представления укладываются в бюджет запросов и времени."""
+        for name, client, method, url, data, status in self.get_cases():
+            with self.subTest(name=name):
+                self.assertQueryBudget(
+                    BUDGETS[name], client, url, method, status, data=data
+                )
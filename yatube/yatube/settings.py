@@ -51,11 +51,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.TemplateProfilerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware'
@@ -66,7 +68,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.backends.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -89,8 +91,11 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.sqlite',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Соединение переживает запрос и проверяется перед первым
+        # обращением к базе в следующем. Прагмы — core.sqlite.base.PRAGMAS.
+        'CONN_MAX_AGE': 600,
     }
 }
 
@@ -139,6 +144,15 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Шаблоны берут только готовые миниатюры; строит их фоновый поток.
+THUMBNAIL_BACKEND = 'posts.thumbnails.PregeneratedBackend'
+
+THUMBNAIL_KVSTORE = 'posts.thumbnails.KVStore'
+
+# Фоновые потоки построения и удаления миниатюр; 0 — сразу в вызывающем
+# потоке. Тесты ставят 0: поток пережил бы тест и его временный MEDIA_ROOT.
+THUMBNAIL_WORKERS = 2
+
 LOGIN_URL = 'users:login'
 
 LOGIN_REDIRECT_URL = 'posts:index'
@@ -151,10 +165,28 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.backends.LocMemCache',
+        # Карточки и фрагменты страниц: ключи несут штампы версий
+        # из базы, поэтому кэш процесса не отдаёт устаревшее.
+        'OPTIONS': {'MAX_ENTRIES': 20000},
     }
 }
 
+# Посты авторов, у которых подписчиков больше этого числа, не раскладываются
+# по лентам при публикации, а подмешиваются в ленту при чтении. Решение
+# хранится в UserCounter.pulled; после смены порога его сверяет
+# manage.py reconcile_counters. Она же, запущенная по расписанию,
+# возвращает в ленты авторов, у которых подписчиков стало меньше.
+FEED_FANOUT_LIMIT = 10000
+
+# Профиль рендеринга шаблонов для персонала по ?profile в адресе.
+# Обёртка ложится на каждый узел шаблона, поэтому включается явно.
+TEMPLATE_PROFILING = False
+
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
+
+# Токен для /metrics: сборщик передаёт его в Authorization: Bearer.
+# Пустой токен — метрики видит только персонал.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')